@@ -0,0 +1,526 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+from trends_csv import collapse_days, parse_trends_csv
+from trends_store import PartitionedStore
+
+# === CONFIGURATION ===
+CUBE_FOLDER = "cube"
+GRANULARITIES = ("week", "month", "6month", "year")
+
+# Calendar-aligned period starts: weeks start on Sunday like the Trends weekly export
+PERIOD_FREQ = {
+    "week": "W-SUN",
+    "month": "MS",
+    "6month": "6MS",
+    "year": "YS",
+}
+
+
+# === WINDOW BOUNDARIES ===
+def month_windows(start, end, step_months=6):
+    # Exact calendar-month steps from start (2020-07-05 -> 2021-01-05 -> ...), last window clipped to end
+    start = pd.Timestamp(start).normalize()
+    end = pd.Timestamp(end).normalize()
+    windows = []
+    i = 0
+    while True:
+        window_start = start + pd.DateOffset(months=step_months * i)
+        if window_start >= end:
+            break
+        window_end = min(start + pd.DateOffset(months=step_months * (i + 1)), end)
+        windows.append((window_start, window_end))
+        i += 1
+    return windows
+
+
+def half_year_start(day):
+    # Jan 1 or Jul 1 of the half-year containing day
+    day = pd.Timestamp(day)
+    return pd.Timestamp(day.year, 1 if day.month <= 6 else 7, 1)
+
+
+def period_windows(start, end, granularity):
+    # Calendar periods (week/month/half-year/year) touching [start, end), clipped to that range
+    start = pd.Timestamp(start).normalize()
+    end = pd.Timestamp(end).normalize()
+    if granularity == "6month":
+        first = half_year_start(start)
+    elif granularity == "week":
+        first = start - pd.Timedelta(days=(start.dayofweek + 1) % 7)
+    else:
+        first = pd.Timestamp(start.year, start.month if granularity == "month" else 1, 1)
+    edges = pd.date_range(first, end, freq=PERIOD_FREQ[granularity])
+    edges = [e for e in edges if e > start]
+    bounds = [start] + edges + ([end] if not edges or edges[-1] < end else [])
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def fetch_ranges(end, years=5):
+    # Daily fetch ranges for the last `years` years: fixed calendar half-years, so every historical range is the
+    # same query from one run to the next (and hits the download cache); only the last one, ending at end, moves
+    start = pd.Timestamp(end).normalize() - pd.Timedelta(days=365 * years)
+    return period_windows(half_year_start(start), end, "6month")
+
+
+def bound_dates(bounds):
+    starts = np.array([np.datetime64(pd.Timestamp(s).date(), "D") for s, _ in bounds], dtype="datetime64[D]")
+    ends = np.array([np.datetime64(pd.Timestamp(e).date(), "D") for _, e in bounds], dtype="datetime64[D]")
+    return starts, ends
+
+
+def windows_frame(columns, bounds, stats):
+    if not bounds:
+        return pd.DataFrame(columns=["Keyword", "Start", "End", "points", "sum", "count", "mean", "max", "area"])
+    k = len(columns)
+    frame = pd.DataFrame({
+        "Keyword": np.tile(columns, len(bounds)),
+        "Start": np.repeat([pd.Timestamp(s) for s, _ in bounds], k),
+        "End": np.repeat([pd.Timestamp(e) for _, e in bounds], k),
+    })
+    for name, values in stats.items():
+        frame[name] = np.asarray(values).reshape(-1)
+    return frame
+
+
+# === AUC ===
+# Weekly-vs-daily AUC windows shared by the dashboard, the API and out_of_core.py (granularity -> label); the
+# default half-years are the same calendar chunks the 5-year rescale uses
+AUC_WINDOWS = {"6month": "Calendar half-year", "month": "Calendar month", "year": "Calendar year"}
+
+
+def auc_bounds(weekly_dates, window="6month"):
+    # Calendar periods between the first and last weekly date in range
+    if len(weekly_dates) < 2:
+        return []
+    return period_windows(weekly_dates[0], weekly_dates[-1], window)
+
+
+def auc_table(weekly_windows, daily_windows, keywords=None):
+    # Weekly vs daily AUC per (keyword, window) from two window frames (TrendsCube.window_frame or
+    # WindowAccumulator.frame); windows with fewer than 2 points on either side are skipped. Rows come in keyword
+    # order (keywords, or the weekly columns), then by window start.
+    both = weekly_windows.merge(daily_windows, on=["Keyword", "Start", "End"], suffixes=("_w", "_d"))
+    order = list(keywords) if keywords is not None else list(dict.fromkeys(weekly_windows["Keyword"]))
+    both = both[both["Keyword"].isin(order) & (both["points_w"] >= 2) & (both["points_d"] >= 2)]
+    both = both.assign(order=both["Keyword"].map(order.index)).sort_values(["order", "Start"], kind="stable")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(both["area_w"] != 0, both["area_d"] / both["area_w"], np.nan)
+    return pd.DataFrame({
+        "Keyword": both["Keyword"].to_numpy(),
+        "Start": both["Start"].dt.strftime("%Y-%m-%d").to_numpy(),
+        "End": both["End"].dt.strftime("%Y-%m-%d").to_numpy(),
+        "Weekly AUC": both["area_w"].to_numpy(),
+        "Daily AUC": both["area_d"].to_numpy(),
+        "AUC Ratio": ratio,
+    })
+
+
+# === CUBE ===
+class TrendsCube:
+    # Prefix sums, counts and trapezoid areas over the daily (or weekly) points of one geo, one column per keyword,
+    # plus a sparse table for range maxima. Any [start, end) window is answered in O(1) from these arrays.
+    def __init__(self, geo, columns, dates=None, values=None):
+        self.geo = geo
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.dates = np.empty(0, dtype="datetime64[D]")
+        self.seconds = np.empty(0, dtype=np.float64)
+        self.cum_sum = np.zeros((1, k))
+        self.cum_count = np.zeros((1, k))
+        self.cum_area = np.zeros((0, k))
+        self.max_levels = []
+        self._last = np.zeros(k)
+        self._rollups = {}
+        self.sources = {}  # fingerprint of the files the cube was built from (see update_cube)
+        if dates is not None:
+            self.append(dates, values)
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def last_date(self):
+        return self.dates[-1] if len(self.dates) else None
+
+    def append(self, dates, values):
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        values = np.asarray(values, dtype=np.float64).reshape(len(dates), len(self.columns))
+
+        # Only days after the current end are taken, so re-feeding an overlapping file is harmless
+        if len(self.dates):
+            keep = dates > self.dates[-1]
+            dates, values = dates[keep], values[keep]
+        if not len(dates):
+            return 0
+        order = np.argsort(dates, kind="stable")
+        dates, values = dates[order], values[order]
+
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+        seconds = dates.astype("datetime64[s]").astype(np.int64).astype(np.float64)
+
+        self.cum_sum = np.vstack([self.cum_sum, self.cum_sum[-1] + np.cumsum(filled, axis=0)])
+        self.cum_count = np.vstack([self.cum_count, self.cum_count[-1] + np.cumsum(valid, axis=0)])
+
+        # Trapezoid segments, including the one bridging the previous last point and the first new one
+        if len(self.dates):
+            x = np.concatenate([self.seconds[-1:], seconds])
+            y = np.vstack([self._last, filled])
+            start_area = self.cum_area[-1]
+        else:
+            x, y = seconds, filled
+            start_area = np.zeros(len(self.columns))
+        segments = (y[1:] + y[:-1]) / 2 * np.diff(x)[:, None]
+        new_area = start_area + np.cumsum(segments, axis=0)
+        if not len(self.dates):
+            new_area = np.vstack([start_area, new_area])
+        self.cum_area = np.vstack([self.cum_area, new_area])
+
+        self.dates = np.concatenate([self.dates, dates])
+        self.seconds = np.concatenate([self.seconds, seconds])
+        self._last = filled[-1]
+        self._extend_max_levels(np.where(valid, values, np.nan))
+        self._rollups = {}
+        return len(dates)
+
+    def _extend_max_levels(self, new_values):
+        # Sparse table: level j holds max over [i, i + 2**j); only the tail touched by new days is computed
+        if not self.max_levels:
+            self.max_levels.append(new_values)
+        else:
+            self.max_levels[0] = np.vstack([self.max_levels[0], new_values])
+        n = len(self.dates)
+        j = 1
+        while (1 << j) <= n:
+            half = 1 << (j - 1)
+            prev = self.max_levels[j - 1]
+            size = n - (1 << j) + 1
+            if j < len(self.max_levels):
+                have = len(self.max_levels[j])
+                tail = np.fmax(prev[have:size], prev[have + half:size + half])
+                self.max_levels[j] = np.vstack([self.max_levels[j], tail])
+            else:
+                self.max_levels.append(np.fmax(prev[:size], prev[half:size + half]))
+            j += 1
+
+    # === QUERIES ===
+    def _positions(self, starts, ends):
+        starts = np.atleast_1d(np.asarray(starts, dtype="datetime64[D]"))
+        ends = np.atleast_1d(np.asarray(ends, dtype="datetime64[D]"))
+        return np.searchsorted(self.dates, starts, "left"), np.searchsorted(self.dates, ends, "left")
+
+    def _range_max(self, lo, hi):
+        out = np.full((len(lo), len(self.columns)), np.nan)
+        length = hi - lo
+        ok = length > 0
+        level = np.zeros(len(lo), dtype=int)
+        level[ok] = np.floor(np.log2(length[ok])).astype(int)
+        for j in np.unique(level[ok]):
+            rows = ok & (level == j)
+            table = self.max_levels[j]
+            out[rows] = np.fmax(table[lo[rows]], table[hi[rows] - (1 << j)])
+        return out
+
+    def windows(self, starts, ends):
+        # Half-open windows [start, end), same as the dashboard's (Date >= start) & (Date < end) masks
+        lo, hi = self._positions(starts, ends)
+        if not len(self.dates):
+            empty = np.zeros((len(lo), len(self.columns)))
+            nan = np.full_like(empty, np.nan)
+            return {"points": empty, "sum": empty, "count": empty, "mean": nan, "max": nan, "area": empty}
+        total = self.cum_sum[hi] - self.cum_sum[lo]
+        count = self.cum_count[hi] - self.cum_count[lo]
+        points = (hi - lo)[:, None]
+        last = np.maximum(hi - 1, 0)
+        area = np.where(points >= 2, self.cum_area[last] - self.cum_area[np.minimum(lo, last)], 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, total / count, np.nan)
+        return {
+            "points": np.broadcast_to(points, total.shape),
+            "sum": total,
+            "count": count,
+            "mean": mean,
+            "max": self._range_max(lo, hi),
+            "area": area,
+        }
+
+    def window(self, start, end):
+        stats = self.windows([start], [end])
+        return {name: dict(zip(self.columns, values[0])) for name, values in stats.items()}
+
+    def window_frame(self, bounds):
+        # Long-format table (one row per window x keyword) for a list of (start, end) pairs
+        if not bounds:
+            return windows_frame(self.columns, bounds, {})
+        starts, ends = bound_dates(bounds)
+        return windows_frame(self.columns, bounds, self.windows(starts, ends))
+
+    def rollup(self, granularity):
+        # Per-period aggregates for a calendar granularity, cached until the next append
+        if granularity not in self._rollups:
+            if not len(self.dates):
+                bounds = []
+            else:
+                bounds = period_windows(self.dates[0], self.dates[-1] + np.timedelta64(1, "D"), granularity)
+            self._rollups[granularity] = self.window_frame(bounds)
+        return self._rollups[granularity]
+
+    def rolling(self, days):
+        # Trailing windows of `days` calendar days ending at every point (inclusive)
+        ends = self.dates + np.timedelta64(1, "D")
+        return self.windows(ends - np.timedelta64(days, "D"), ends)
+
+    def year_over_year(self, start, end, years=1):
+        # Same window shifted back by whole calendar years
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        offset = pd.DateOffset(years=years)
+        current = self.window(start, end)
+        previous = self.window(start - offset, end - offset)
+        return current, previous
+
+    # === PERSISTENCE ===
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Unique per process and thread: the dashboard, the API and ingest may all refresh the same cube
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez(
+            tmp_path,
+            geo=np.array(self.geo),
+            columns=np.array(self.columns),
+            dates=self.dates,
+            cum_sum=self.cum_sum,
+            cum_count=self.cum_count,
+            cum_area=self.cum_area,
+            last=self._last,
+            sources=np.array(json.dumps(self.sources)),
+            **{f"max_{j}": level for j, level in enumerate(self.max_levels)},
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            cube = cls(str(data["geo"]), [str(c) for c in data["columns"]])
+            cube.dates = data["dates"]
+            cube.seconds = cube.dates.astype("datetime64[s]").astype(np.int64).astype(np.float64)
+            cube.cum_sum = data["cum_sum"]
+            cube.cum_count = data["cum_count"]
+            cube.cum_area = data["cum_area"]
+            cube._last = data["last"]
+            cube.sources = json.loads(str(data["sources"])) if "sources" in data.files else {}
+            levels = sorted((k for k in data.files if k.startswith("max_")), key=lambda k: int(k[4:]))
+            cube.max_levels = [data[k] for k in levels]
+        return cube
+
+
+# === STREAMING WINDOWS ===
+class WindowAccumulator:
+    # TrendsCube.windows() for a fixed list of windows, fed partition by partition in date order. Only running
+    # totals and per-window snapshots are kept, so memory does not grow with the number of days. The running sums
+    # continue left to right exactly like the cube's cumsums, so the results are identical to the in-memory cube.
+    def __init__(self, columns, bounds):
+        self.columns = list(columns)
+        self.bounds = list(bounds)
+        k = len(self.columns)
+        self.starts, self.ends = bound_dates(self.bounds)
+        self.edges = np.unique(np.concatenate([self.starts, self.ends]))
+        n = len(self.edges)
+        # Per edge: cube index of the first point on/after it, cum_sum/cum_count there, cum_area at it and before it
+        self.index = np.full(n, -1)
+        self.sum_at = np.zeros((n, k))
+        self.count_at = np.zeros((n, k))
+        self.area_at = np.full((n, k), np.nan)
+        self.area_before = np.zeros((n, k))
+        self.max = np.full((len(self.bounds), k), np.nan)
+        self.n_points = 0
+        self.run_sum = np.zeros(k)
+        self.run_count = np.zeros(k)
+        self.run_area = np.zeros(k)
+        self._last_date = None
+        self._last_seconds = None
+        self._last_filled = None
+
+    def feed(self, dates, values):
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        if not len(dates):
+            return
+        values = np.asarray(values, dtype=np.float64).reshape(len(dates), len(self.columns))
+        if np.any(np.diff(dates) <= np.timedelta64(0, "D")) or (self._last_date is not None and dates[0] <= self._last_date):
+            raise ValueError("Partitions must be fed in increasing date order")
+
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+        seconds = dates.astype("datetime64[s]").astype(np.int64).astype(np.float64)
+
+        # Row j of sums/counts is the cube's cum_sum/cum_count at this batch's point j (days before it)
+        sums = np.cumsum(np.vstack([self.run_sum, filled]), axis=0)
+        counts = np.cumsum(np.vstack([self.run_count, valid]), axis=0)
+        if self.n_points:
+            x = np.concatenate([[self._last_seconds], seconds])
+            y = np.vstack([self._last_filled, filled])
+            segments = (y[1:] + y[:-1]) / 2 * np.diff(x)[:, None]
+            areas = np.cumsum(np.vstack([self.run_area, segments]), axis=0)[1:]
+        else:
+            segments = (filled[1:] + filled[:-1]) / 2 * np.diff(seconds)[:, None]
+            areas = np.cumsum(np.vstack([np.zeros(len(self.columns)), segments]), axis=0)
+
+        # Edges whose first point on/after them falls in this batch
+        pending = self.index < 0
+        positions = np.searchsorted(dates, self.edges, "left")
+        hit = pending & (positions < len(dates))
+        for e in np.flatnonzero(hit):
+            p = positions[e]
+            self.index[e] = self.n_points + p
+            self.sum_at[e] = sums[p]
+            self.count_at[e] = counts[p]
+            self.area_at[e] = areas[p]
+            self.area_before[e] = areas[p - 1] if p else self.run_area
+
+        # Range maxima: fmax of each window's slice of this batch
+        lo = np.searchsorted(dates, self.starts, "left")
+        hi = np.searchsorted(dates, self.ends, "left")
+        for w in np.flatnonzero(hi > lo):
+            self.max[w] = np.fmax(self.max[w], np.fmax.reduce(values[lo[w]:hi[w]], axis=0))
+
+        self.n_points += len(dates)
+        self.run_sum = sums[-1]
+        self.run_count = counts[-1]
+        self.run_area = areas[-1]
+        self._last_date = dates[-1]
+        self._last_seconds = seconds[-1]
+        self._last_filled = filled[-1]
+
+    def windows(self):
+        # Edges after the last point sit at the end of the cube
+        index = np.where(self.index < 0, self.n_points, self.index)
+        sum_at = np.where((self.index < 0)[:, None], self.run_sum, self.sum_at)
+        count_at = np.where((self.index < 0)[:, None], self.run_count, self.count_at)
+        area_before = np.where((self.index < 0)[:, None], self.run_area, self.area_before)
+
+        s = np.searchsorted(self.edges, self.starts)
+        e = np.searchsorted(self.edges, self.ends)
+        points = (index[e] - index[s])[:, None]
+        total = sum_at[e] - sum_at[s]
+        count = count_at[e] - count_at[s]
+        if not self.n_points:
+            empty = np.zeros((len(self.bounds), len(self.columns)))
+            nan = np.full_like(empty, np.nan)
+            return {"points": empty, "sum": empty, "count": empty, "mean": nan, "max": nan, "area": empty}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, total / count, np.nan)
+            area = np.where(points >= 2, area_before[e] - self.area_at[s], 0.0)
+        return {
+            "points": np.broadcast_to(points, total.shape),
+            "sum": total,
+            "count": count,
+            "mean": mean,
+            "max": self.max,
+            "area": area,
+        }
+
+    def frame(self):
+        return windows_frame(self.columns, self.bounds, self.windows() if self.bounds else {})
+
+
+# === BUILD / UPDATE FROM CSV ===
+def cube_path(geo, name):
+    return os.path.join(CUBE_FOLDER, f"{geo}_{name}.npz")
+
+
+def source_files(source):
+    # A CSV file, or every yearly partition of a store folder
+    if os.path.isdir(source):
+        return [path for _, path in PartitionedStore(source).partitions()]
+    return [source]
+
+
+def _prefix_hash(path, size):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while size > 0:
+            block = f.read(min(1 << 20, size))
+            if not block:
+                break
+            digest.update(block)
+            size -= len(block)
+    return digest.hexdigest()
+
+
+def fingerprint(source, previous=None):
+    # {file: [size, mtime_ns, sha256]}; files whose size and mtime are unchanged keep their previous hash
+    previous = previous or {}
+    prints = {}
+    for path in source_files(source):
+        key = os.path.abspath(path)
+        stat = os.stat(path)
+        old = previous.get(key)
+        if old and old[:2] == [stat.st_size, stat.st_mtime_ns]:
+            prints[key] = old
+        else:
+            prints[key] = [stat.st_size, stat.st_mtime_ns, _prefix_hash(path, stat.st_size)]
+    return prints
+
+
+def only_appended(previous, source):
+    # True when every file the cube was built from still starts with the bytes it had then
+    current = {os.path.abspath(path) for path in source_files(source)}
+    for path, (size, mtime, digest) in previous.items():
+        if path not in current:
+            return False
+        stat = os.stat(path)
+        if [stat.st_size, stat.st_mtime_ns] == [size, mtime]:
+            continue
+        if stat.st_size < size or _prefix_hash(path, size) != digest:
+            return False
+    return True
+
+
+def update_cube(source, path, geo="IN", less_than_one=0.0):
+    # Loads the stored cube and parses only the days after its last date; builds it from scratch the first time.
+    # source is a CSV file or a store folder. A source that was rewritten rather than appended to (a re-run of the
+    # rescaler, a re-downloaded weekly export) gets a full rebuild, so the cube never mixes old and new values.
+    cube = TrendsCube.load(path) if os.path.exists(path) else None
+    if cube is not None and not only_appended(cube.sources, source):
+        cube = None
+    start = cube.last_date + np.timedelta64(1, "D") if cube is not None and len(cube) else None
+
+    table = _read_source(source, less_than_one, start)
+    if cube is not None and set(table.columns) != set(cube.columns):
+        # Keywords were added or dropped: start over
+        cube = None
+        table = _read_source(source, less_than_one)
+    if cube is None:
+        cube = TrendsCube(geo, table.columns)
+    elif table.columns != cube.columns:
+        table_index = {col: i for i, col in enumerate(table.columns)}
+        table = table._replace(values=table.values[:, [table_index[col] for col in cube.columns]])
+
+    added = cube.append(table.dates, table.values)
+    sources = fingerprint(source, cube.sources)
+    if added or sources != cube.sources or not os.path.exists(path):
+        cube.sources = sources
+        cube.save(path)
+    return cube, added
+
+
+def _read_source(source, less_than_one, start=None):
+    if os.path.isdir(source):
+        return PartitionedStore(source).read_table(dtype=np.float64, start=start)
+    return collapse_days(parse_trends_csv(source, less_than_one, dtype=np.float64, start=start))
+
+
+if __name__ == "__main__":
+    # Usage: python aggregate_cube.py <csv or store folder> <name> [geo]
+    if len(sys.argv) < 3:
+        print("[ERROR] Usage: python aggregate_cube.py <csv or store folder> <name> [geo]")
+        sys.exit(1)
+    geo = sys.argv[3] if len(sys.argv) > 3 else "IN"
+    cube, added = update_cube(sys.argv[1], cube_path(geo, sys.argv[2]), geo)
+    print(f"✅ Cube {cube_path(geo, sys.argv[2])}: {len(cube)} points, {added} new")
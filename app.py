@@ -1,79 +1,126 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objs as go
 import numpy as np
 import os
 from datetime import timedelta
 import subprocess
 import datetime
 import glob
-import matplotlib.pyplot as plt
-import re
+from trends_config import load_registry
+from trends_csv import read_trends_frame
+from trends_store import PartitionedStore, read_columns, read_frame, source_version
+from aggregate_cube import AUC_WINDOWS, auc_bounds, auc_table, cube_path, update_cube
+from trends_analytics import ZSCORE_THRESHOLD, analyze_file
+from ingest_incremental import OVERLAP_DAYS, ingest
 
-# === Load Files ===
-weekly_path = "downloads_compare/geo_IN_compare.csv"
-daily_path = "merged/5keywords_combined_daily_scaled.csv"
-meta_path = "meta/last_processed_date.txt"
+# === Files ===
+# Paths, keywords and the fixed reference all come from trends_config.json / keywords.csv
+config = load_registry()
+weekly_path = config.weekly_file
+# Daily data comes from the append-only store once ingest_incremental.py has created it
+daily_path = config.store_folder() if PartitionedStore(config.store_folder()).exists() else config.daily_scaled_file
+meta_path = config.paths.last_processed_file
 
-weekly_df = pd.read_csv(weekly_path, skiprows=2)
-daily_df = pd.read_csv(daily_path)
+# Fixed reference keyword (export column name)
+ref_keyword = config.reference_keyword.display_name
+fixed_path = config.fixed_reference_file
 
-# Define fixed reference keyword
-ref_keyword = "Combined Graduate Level Examination: (India)"
+# np.trapz was renamed to np.trapezoid in NumPy 2
+trapz = getattr(np, "trapezoid", None) or np.trapz
 
-# Safe file name conversion
-def safe_filename(name):
-    return re.sub(r'[\\/:"*?<>|]+', "_", name)
 
-safe_name = safe_filename(ref_keyword)
-fixed_path = f"merged/{safe_name}_combined_daily_scaled.csv"
+# === Loaders ===
+# Every loader takes the keyword list and date range, so only the rows/columns a section shows are parsed.
+# The file's (or store's) version is part of the cache key so a rescale, fetch or ingest invalidates it.
+def file_version(path):
+    return source_version(path) if os.path.exists(path) else None
 
-if os.path.exists(fixed_path):
-    daily_fixed_df = pd.read_csv(fixed_path)
-    daily_fixed_df.rename(columns={"Day": "Date"}, inplace=True)
-    daily_fixed_df["Date"] = pd.to_datetime(daily_fixed_df["Date"])
-else:
-    st.warning("⚠️ Fixed reference scaled file not found. Skipping extra plot.")
-    daily_fixed_df = None
-weekly_df.rename(columns={"Week": "Date"}, inplace=True)
-daily_df.rename(columns={"Day": "Date"}, inplace=True)
 
-weekly_df["Date"] = pd.to_datetime(weekly_df["Date"])
-daily_df["Date"] = pd.to_datetime(daily_df["Date"])
+@st.cache_data(show_spinner=False)
+def load_series(path, keywords, start=None, end=None, version=None):
+    return read_frame(path, date_column="Date", usecols=list(keywords), dtype=np.float64, start=start, end=end)
 
-# Get common keywords
-weekly_keywords = [col for col in weekly_df.columns if col != "Date"]
-daily_keywords = [col for col in daily_df.columns if col != "Date"]
-keywords = list(set(weekly_keywords) & set(daily_keywords))
 
-# === UI ===
-st.set_page_config(layout="wide")
-st.title("📊 Google Trends Comparison Dashboard")
-st.write("Comparison of original weekly and scaled daily data over 5 years.")
+@st.cache_resource(show_spinner=False)
+def load_cube(path, name, version=None):
+    # Persisted under cube/; a new version only parses the days added since the cube was last saved
+    return update_cube(path, cube_path(config.primary_geo, name), config.primary_geo)[0]
+
+
+@st.cache_data(show_spinner=False)
+def load_date_bounds(path, version=None):
+    dates = read_frame(path, date_column="Date", usecols=[])["Date"]
+    return dates.min().date(), dates.max().date()
+
+
+def load_weekly(keywords, start=None, end=None):
+    return load_series(weekly_path, keywords, start, end, file_version(weekly_path))
+
+
+def load_daily(keywords, start=None, end=None):
+    return load_series(daily_path, keywords, start, end, file_version(daily_path))
+
+
+def load_fixed(keywords, start=None, end=None):
+    if not os.path.exists(fixed_path):
+        return None
+    return load_series(fixed_path, keywords, start, end, file_version(fixed_path))
+
+
+def auc_row(kw, start, end, w_chunk, d_chunk, ratio_label):
+    w_values = w_chunk[kw].fillna(0)
+    d_values = d_chunk[kw].fillna(0)
+
+    if len(w_values) < 2 or len(d_values) < 2:
+        return None
+
+    w_auc = trapz(w_values, x=w_chunk["Date"].astype(np.int64) / 1e9)
+    d_auc = trapz(d_values, x=d_chunk["Date"].astype(np.int64) / 1e9)
+    ratio = d_auc / w_auc if w_auc else np.nan
+
+    return {
+        "Keyword": kw,
+        "Start": start.date(),
+        "End": end.date(),
+        "Weekly AUC": round(w_auc, 2),
+        "Daily AUC": round(d_auc, 2),
+        ratio_label: round(ratio, 4) if w_auc else "-"
+    }
+
+
+# === Sections ===
+def section_trends(keywords, start, end):
+    import plotly.graph_objs as go
+
+    weekly_df = load_weekly(keywords, start, end)
+    daily_df = load_daily(keywords, start, end)
+
+    # === Weekly Chart ===
+    st.subheader("📘 Weekly Trend (Original)")
+    fig1 = go.Figure()
+    for kw in keywords:
+        fig1.add_trace(go.Scatter(x=weekly_df["Date"], y=weekly_df[kw], mode="lines", name=kw))
+    fig1.update_layout(height=400, hovermode="x unified", template="plotly_white")
+    st.plotly_chart(fig1, use_container_width=True)
+
+    # === Daily Chart ===
+    st.subheader("🔴 Daily Trend (Scaled) with Weekly Averages")
+    fig2 = go.Figure()
+    for kw in keywords:
+        fig2.add_trace(go.Scatter(x=daily_df["Date"], y=daily_df[kw], mode="lines", name=f"{kw} (Daily)"))
+
+        # Add weekly avg to same chart
+        fig2.add_trace(go.Scatter(x=weekly_df["Date"], y=weekly_df[kw],
+                                  mode="lines", name=f"{kw} (Weekly Avg)", line=dict(dash="dot")))
+
+    fig2.update_layout(height=400, hovermode="x unified", template="plotly_white")
+    st.plotly_chart(fig2, use_container_width=True)
+
+    daily_fixed_df = load_fixed(keywords, start, end)
+    if daily_fixed_df is None:
+        st.warning("⚠️ Fixed reference scaled file not found. Skipping extra plot.")
+        return
 
-# === Weekly Chart ===
-st.subheader("📘 Weekly Trend (Original)")
-fig1 = go.Figure()
-for kw in keywords:
-    fig1.add_trace(go.Scatter(x=weekly_df["Date"], y=weekly_df[kw], mode="lines", name=kw))
-fig1.update_layout(height=400, hovermode="x unified", template="plotly_white")
-st.plotly_chart(fig1, use_container_width=True)
-
-# === Daily Chart ===
-st.subheader("🔴 Daily Trend (Scaled) with Weekly Averages")
-fig2 = go.Figure()
-for kw in keywords:
-    fig2.add_trace(go.Scatter(x=daily_df["Date"], y=daily_df[kw], mode="lines", name=f"{kw} (Daily)"))
-
-    # Add weekly avg to same chart
-    weekly_avg = weekly_df[["Date", kw]].rename(columns={kw: f"{kw} (Weekly Avg)"})
-    fig2.add_trace(go.Scatter(x=weekly_avg["Date"], y=weekly_avg[f"{kw} (Weekly Avg)"],
-                              mode="lines", name=f"{kw} (Weekly Avg)", line=dict(dash="dot")))
-
-fig2.update_layout(height=400, hovermode="x unified", template="plotly_white")
-st.plotly_chart(fig2, use_container_width=True)
-
-if daily_fixed_df is not None:
     st.subheader(f"🟢 Daily Trend (Fixed Reference: `{ref_keyword}`)")
     fig_fixed = go.Figure()
     for kw in keywords:
@@ -87,165 +134,208 @@ if daily_fixed_df is not None:
     st.plotly_chart(fig_fixed, use_container_width=True)
 
 
-# Get common keywords (already calculated above)
-for kw in keywords:
-    st.markdown(f"### 📈 Keyword: `{kw}`")
-
-    fig, ax = plt.subplots(figsize=(10, 4))
-
-    # Plot weekly data
-    ax.plot(weekly_df["Date"], weekly_df[kw], label="Weekly (Original)", linestyle="--", alpha=0.7)
-
-    # Plot daily scaled data (fixed reference)
-    ax.plot(daily_df["Date"], daily_df[kw], label="Daily (Rescaled with Fixed Reference)", alpha=0.9)
+def section_keyword_detail(keywords, start, end):
+    # matplotlib is only needed here, so it is not imported on dashboard startup
+    import matplotlib.pyplot as plt
 
-    ax.set_ylabel("Interest")
-    ax.set_xlabel("Date")
-    ax.legend()
-    ax.grid(True)
-    st.pyplot(fig)
+    weekly_df = load_weekly(keywords, start, end)
+    daily_df = load_daily(keywords, start, end)
 
-# === AUC Comparison Every 6 Months ===
-st.subheader("📀 Area Under Curve (AUC) Comparison — Every 6 Months")
-start_date = weekly_df["Date"].min().normalize()
-end_date = weekly_df["Date"].max().normalize()
-chunks = []
-
-while start_date < end_date:
-    next_date = start_date + pd.DateOffset(months=6)
-    chunks.append((start_date, min(next_date, end_date)))
-    start_date = next_date
+    for kw in keywords:
+        with st.expander(f"📈 Keyword: `{kw}`", expanded=len(keywords) == 1):
+            fig, ax = plt.subplots(figsize=(10, 4))
+
+            # Plot weekly data
+            ax.plot(weekly_df["Date"], weekly_df[kw], label="Weekly (Original)", linestyle="--", alpha=0.7)
+
+            # Plot daily scaled data (fixed reference)
+            ax.plot(daily_df["Date"], daily_df[kw], label="Daily (Rescaled with Fixed Reference)", alpha=0.9)
+
+            ax.set_ylabel("Interest")
+            ax.set_xlabel("Date")
+            ax.legend()
+            ax.grid(True)
+            st.pyplot(fig)
+            plt.close(fig)
+
+
+def auc_display_rows(keywords, bounds, ratio_label):
+    # Weekly vs daily AUC for every (keyword, window), answered from the prefix-sum cubes, rounded for display
+    w = load_cube(weekly_path, "weekly", file_version(weekly_path)).window_frame(bounds)
+    d = load_cube(daily_path, "daily_scaled", file_version(daily_path)).window_frame(bounds)
+    rows = []
+    for r in auc_table(w, d, keywords).itertuples(index=False):
+        w_auc, d_auc, ratio = r[3], r[4], r[5]
+        rows.append({
+            "Keyword": r.Keyword,
+            "Start": r.Start,
+            "End": r.End,
+            "Weekly AUC": round(w_auc, 2),
+            "Daily AUC": round(d_auc, 2),
+            ratio_label: round(ratio, 4) if w_auc else "-"
+        })
+    return rows
 
-auc_rows = []
 
-for kw in keywords:
-    for start, end in chunks:
-        w_chunk = weekly_df[(weekly_df["Date"] >= start) & (weekly_df["Date"] < end)].dropna()
-        d_chunk = daily_df[(daily_df["Date"] >= start) & (daily_df["Date"] < end)].dropna()
+def section_auc(keywords, start, end):
+    import plotly.graph_objs as go
 
-        w_values = pd.to_numeric(w_chunk[kw], errors="coerce").fillna(0)
-        d_values = pd.to_numeric(d_chunk[kw], errors="coerce").fillna(0)
+    weekly_dates = load_cube(weekly_path, "weekly", file_version(weekly_path)).dates
+    weekly_dates = weekly_dates[(weekly_dates >= np.datetime64(start)) & (weekly_dates <= np.datetime64(end))]
+    if len(weekly_dates) < 2:
+        st.warning("⚠️ Not enough weekly data in the selected range.")
+        return
 
-        if len(w_values) < 2 or len(d_values) < 2:
-            continue
+    # === AUC Comparison Every 6 Months ===
+    window = st.radio("Window", list(AUC_WINDOWS), format_func=AUC_WINDOWS.get, horizontal=True)
+    window_label = AUC_WINDOWS[window]
+    st.subheader(f"📀 Area Under Curve (AUC) Comparison — {window_label}")
+    chunks = auc_bounds(weekly_dates, window)
 
-        w_auc = np.trapz(w_values, x=w_chunk["Date"].astype(np.int64) / 1e9)
-        d_auc = np.trapz(d_values, x=d_chunk["Date"].astype(np.int64) / 1e9)
-        ratio = d_auc / w_auc if w_auc else np.nan
+    auc_rows = auc_display_rows(keywords, chunks, "AUC Ratio (Daily / Weekly)")
+    st.dataframe(pd.DataFrame(auc_rows), use_container_width=True)
 
-        auc_rows.append({
+    # === AUC Ratio Bar Chart ===
+    st.subheader("📈 AUC Ratio Trend (Bar Chart)")
+    for kw in keywords:
+        chunk_labels = [f"{row['Start']}→{row['End']}" for row in auc_rows if row["Keyword"] == kw]
+        ratios = [row["AUC Ratio (Daily / Weekly)"] for row in auc_rows if row["Keyword"] == kw]
+
+        if ratios:
+            fig_bar = go.Figure()
+            fig_bar.add_trace(go.Bar(x=chunk_labels, y=ratios, name=kw))
+            fig_bar.update_layout(title=f"AUC Ratios for '{kw}'", yaxis_title="Daily / Weekly AUC",
+                                  xaxis_title=f"{window_label} Chunks", height=400)
+            st.plotly_chart(fig_bar, use_container_width=True)
+
+    # === Custom Window vs. Same Window a Year Earlier ===
+    st.subheader("🎚️ Custom Window Comparison (Year over Year)")
+    daily_cube = load_cube(daily_path, "daily_scaled", file_version(daily_path))
+    window = st.slider("Window", min_value=start, max_value=end,
+                       value=(max(start, end - timedelta(days=90)), end), format="YYYY-MM-DD")
+    # Slider end is inclusive; cube windows are [start, end)
+    current, previous = daily_cube.year_over_year(window[0], window[1] + timedelta(days=1))
+    yoy_rows = []
+    for kw in keywords:
+        yoy_rows.append({
             "Keyword": kw,
-            "Start": start.date(),
-            "End": end.date(),
-            "Weekly AUC": round(w_auc, 2),
-            "Daily AUC": round(d_auc, 2),
-            "AUC Ratio (Daily / Weekly)": round(ratio, 4) if w_auc else "-"
+            "Daily AUC": round(current["area"][kw], 2),
+            "Daily AUC (Year Before)": round(previous["area"][kw], 2),
+            "Mean": round(current["mean"][kw], 2),
+            "Mean (Year Before)": round(previous["mean"][kw], 2),
+            "Peak": current["max"][kw],
+            "Peak (Year Before)": previous["max"][kw],
         })
+    st.dataframe(pd.DataFrame(yoy_rows), use_container_width=True)
+
+
+def section_analytics(keywords, start, end):
+    import plotly.graph_objs as go
+
+    # Computed once for all keywords per data version (see trends_analytics.analyze_file)
+    results = analyze_file(daily_path)
+
+    st.subheader("🔍 Seasonality & Peak Demand")
+    seasonality = results["seasonality"]
+    st.dataframe(seasonality[seasonality["Keyword"].isin(keywords)], use_container_width=True)
+
+    st.subheader("🏔️ Yearly Peaks")
+    peaks = results["peaks"]
+    peaks = peaks[peaks["Keyword"].isin(keywords) & peaks["Year"].between(start.year, end.year)]
+    st.dataframe(peaks.pivot(index="Year", columns="Keyword", values="Peak Day"), use_container_width=True)
+
+    st.subheader(f"⚡ Spikes (rolling z-score > {ZSCORE_THRESHOLD})")
+    spikes = results["spikes"]
+    spikes = spikes[spikes["Day"].between(pd.Timestamp(start), pd.Timestamp(end))]
+    st.dataframe(spikes[spikes["Keyword"].isin(keywords)].sort_values("Day", ascending=False), use_container_width=True)
+
+    st.subheader("🧩 Decomposition")
+    kw = st.selectbox("Keyword", keywords)
+    observed = results["trend"][kw] + results["seasonal"][kw] + results["resid"][kw]
+    observed = observed[pd.Timestamp(start):pd.Timestamp(end)]
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=observed.index, y=observed, mode="lines", name="Daily", opacity=0.5))
+    for part in ("trend", "seasonal"):
+        series = results[part][kw][pd.Timestamp(start):pd.Timestamp(end)]
+        fig.add_trace(go.Scatter(x=series.index, y=series, mode="lines", name=part.title()))
+    kw_spikes = spikes[spikes["Keyword"] == kw]
+    fig.add_trace(go.Scatter(x=kw_spikes["Day"], y=kw_spikes["Interest"], mode="markers", name="Spike",
+                             marker=dict(color="red", size=7)))
+    fig.update_layout(height=400, hovermode="x unified", template="plotly_white")
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def section_recent(keywords, start, end):
+    # === NEW: Recent N-Day Update Section ===
+    st.subheader("🆕 Recent Update Comparison")
+
+    # Load last processed date if exists
+    last_processed_date = None
+    if os.path.exists(meta_path):
+        with open(meta_path, 'r') as f:
+            last_processed_date = pd.to_datetime(f.read().strip())
+
+    if last_processed_date:
+        st.info(f"Last update was until: {last_processed_date.date()}")
+        recent_start = last_processed_date + timedelta(days=1)
+        w_recent = load_weekly(keywords, start=recent_start.date()).dropna()
+        d_recent = load_daily(keywords, start=recent_start.date()).dropna()
+        # Series.max() skips NaT, so an empty weekly (or daily) slice does not blank out the other one
+        recent_end = pd.concat([w_recent["Date"], d_recent["Date"]]).max()
+        if pd.isna(recent_end):
+            recent_end = recent_start
+        st.write(f"Checking data from {recent_start.date()} to {recent_end.date()}")
+
+        update_rows = []
+        for kw in keywords:
+            row = auc_row(kw, recent_start, recent_end, w_recent, d_recent, "AUC Ratio")
+            if row:
+                update_rows.append(row)
+
+        if update_rows:
+            st.dataframe(pd.DataFrame(update_rows), use_container_width=True)
+    else:
+        st.warning(f"No {meta_path} found. Create it to enable incremental comparison.")
 
-st.dataframe(pd.DataFrame(auc_rows), use_container_width=True)
-
-# === AUC Ratio Bar Chart ===
-st.subheader("📈 AUC Ratio Trend (Bar Chart)")
-for kw in keywords:
-    chunk_labels = [f"{row['Start']}→{row['End']}" for row in auc_rows if row["Keyword"] == kw]
-    ratios = [row["AUC Ratio (Daily / Weekly)"] for row in auc_rows if row["Keyword"] == kw]
-
-    if ratios:
-        fig_bar = go.Figure()
-        fig_bar.add_trace(go.Bar(x=chunk_labels, y=ratios, name=kw))
-        fig_bar.update_layout(title=f"AUC Ratios for '{kw}'", yaxis_title="Daily / Weekly AUC",
-                              xaxis_title="6-Month Chunks", height=400)
-        st.plotly_chart(fig_bar, use_container_width=True)
-
-# === NEW: Recent N-Day Update Section ===
-st.subheader("🆕 Recent Update Comparison")
-
-# Load last processed date if exists
-last_processed_date = None
-if os.path.exists(meta_path):
-    with open(meta_path, 'r') as f:
-        last_processed_date = pd.to_datetime(f.read().strip())
-
-if last_processed_date:
-    st.info(f"Last update was until: {last_processed_date.date()}")
-    recent_start = last_processed_date + timedelta(days=1)
-    recent_end = max(weekly_df["Date"].max(), daily_df["Date"].max())
-    st.write(f"Checking data from {recent_start.date()} to {recent_end.date()}")
-
-    update_rows = []
-    for kw in keywords:
-        w_recent = weekly_df[(weekly_df["Date"] >= recent_start)].dropna()
-        d_recent = daily_df[(daily_df["Date"] >= recent_start)].dropna()
-
-        w_vals = pd.to_numeric(w_recent[kw], errors="coerce").fillna(0)
-        d_vals = pd.to_numeric(d_recent[kw], errors="coerce").fillna(0)
-
-        if len(w_vals) > 1 and len(d_vals) > 1:
-            w_auc = np.trapz(w_vals, x=w_recent["Date"].astype(np.int64) / 1e9)
-            d_auc = np.trapz(d_vals, x=d_recent["Date"].astype(np.int64) / 1e9)
-            ratio = d_auc / w_auc if w_auc else np.nan
-
-            update_rows.append({
-                "Keyword": kw,
-                "Start": recent_start.date(),
-                "End": recent_end.date(),
-                "Weekly AUC": round(w_auc, 2),
-                "Daily AUC": round(d_auc, 2),
-                "AUC Ratio": round(ratio, 4) if w_auc else "-"
-            })
-
-    if update_rows:
-        st.dataframe(pd.DataFrame(update_rows), use_container_width=True)
-else:
-    st.warning("No meta/last_processed_date.txt found. Create it to enable incremental comparison.")
-
-# === Detect & Process Only New Data ===
-st.subheader("🆕 Newly Added Data Analysis (Incremental)")
-
-history_file = "auc_history.csv"
-last_date = None
+    # === Detect & Process Only New Data ===
+    st.subheader("🆕 Newly Added Data Analysis (Incremental)")
 
-if os.path.exists(history_file):
-    hist_df = pd.read_csv(history_file)
-    last_date = pd.to_datetime(hist_df["End"]).max()
-else:
-    hist_df = pd.DataFrame()
+    history_file = "auc_history.csv"
+    last_date = None
 
-# Determine new time window
-new_start = last_date + pd.Timedelta(days=1) if last_date else weekly_df["Date"].min()
-new_end = weekly_df["Date"].max()
+    if os.path.exists(history_file):
+        hist_df = pd.read_csv(history_file)
+        last_date = pd.to_datetime(hist_df["End"]).max()
+    else:
+        hist_df = pd.DataFrame()
 
-if new_start >= new_end:
-    st.info("✅ No new data to process. All data already analyzed.")
-else:
-    st.success(f"🔄 Analyzing new data from **{new_start.date()}** to **{new_end.date()}**")
+    # Determine new time window
+    new_start = last_date + pd.Timedelta(days=1) if last_date else None
+    w_new = load_weekly(keywords, start=new_start).dropna()
+    d_new = load_daily(keywords, start=new_start).dropna()
 
-    new_rows = []
-    for kw in keywords:
-        w_chunk = weekly_df[(weekly_df["Date"] >= new_start) & (weekly_df["Date"] <= new_end)].dropna()
-        d_chunk = daily_df[(daily_df["Date"] >= new_start) & (daily_df["Date"] <= new_end)].dropna()
+    if w_new.empty:
+        st.info("✅ No new data to process. All data already analyzed.")
+        return
 
-        if w_chunk.empty or d_chunk.empty:
-            continue
+    new_start = new_start if new_start is not None else w_new["Date"].min()
+    new_end = w_new["Date"].max()
 
-        w_values = pd.to_numeric(w_chunk[kw], errors="coerce").fillna(0)
-        d_values = pd.to_numeric(d_chunk[kw], errors="coerce").fillna(0)
+    if new_start >= new_end:
+        st.info("✅ No new data to process. All data already analyzed.")
+        return
 
-        if len(w_values) < 2 or len(d_values) < 2:
-            continue
+    st.success(f"🔄 Analyzing new data from **{new_start.date()}** to **{new_end.date()}**")
 
-        w_auc = np.trapz(w_values, x=w_chunk["Date"][:len(w_values)].astype(np.int64) / 1e9)
-        d_auc = np.trapz(d_values, x=d_chunk["Date"][:len(d_values)].astype(np.int64) / 1e9)
-        ratio = d_auc / w_auc if w_auc else np.nan
+    w_chunk = w_new[w_new["Date"] <= new_end]
+    d_chunk = d_new[d_new["Date"] <= new_end]
 
-        new_rows.append({
-            "Keyword": kw,
-            "Start": new_start.date(),
-            "End": new_end.date(),
-            "Weekly AUC": round(w_auc, 2),
-            "Daily AUC": round(d_auc, 2),
-            "AUC Ratio (Daily / Weekly)": round(ratio, 4) if w_auc else "-"
-        })
+    new_rows = []
+    if not w_chunk.empty and not d_chunk.empty:
+        for kw in keywords:
+            row = auc_row(kw, new_start, new_end, w_chunk, d_chunk, "AUC Ratio (Daily / Weekly)")
+            if row:
+                new_rows.append(row)
 
     if new_rows:
         new_df = pd.DataFrame(new_rows)
@@ -258,75 +348,82 @@ else:
     else:
         st.warning("⚠️ No valid new data rows to process.")
 
-st.markdown("---")
-st.subheader("🔄 Fetch & Append New Google Trends Data")
 
-# Read last processed date
-with open("meta/last_processed_date.txt", "r") as f:
-    last_processed_date = datetime.datetime.strptime(f.read().strip(), "%Y-%m-%d").date()
+def section_fetch(keywords, start, end):
+    st.subheader("🔄 Fetch & Append New Google Trends Data")
 
-today = datetime.date.today()
-st.info(f"Last processed date: {last_processed_date}")
+    # Read last processed date
+    with open(meta_path, "r") as f:
+        last_processed_date = datetime.datetime.strptime(f.read().strip(), "%Y-%m-%d").date()
 
-if today <= last_processed_date:
-    st.success("✅ Data is already up to date!")
-else:
-    if st.button("📥 Fetch Incremental Google Trends Data"):
-        st.write(f"📆 Fetching daily data from {last_processed_date + datetime.timedelta(days=1)} to {today}...")
+    today = datetime.date.today()
+    st.info(f"Last processed date: {last_processed_date}")
 
-        # Call the new incremental scraper
-        result = subprocess.run(["python", "google_trends_incremental_scraper.py", str(last_processed_date + datetime.timedelta(days=1)), str(today)], capture_output=True, text=True)
+    if today <= last_processed_date:
+        st.success("✅ Data is already up to date!")
+    else:
+        if st.button("📥 Fetch Incremental Google Trends Data"):
+            # Start before the last processed date: the overlap is what anchors the new file to the stored scale
+            fetch_start = last_processed_date - datetime.timedelta(days=OVERLAP_DAYS)
+            st.write(f"📆 Fetching daily data from {fetch_start} to {today}...")
+
+            # Call the new incremental scraper
+            result = subprocess.run(["python", "google_trends_incremental_scraper.py", str(fetch_start), str(today)], capture_output=True, text=True)
+
+            if result.returncode == 0:
+                st.success("✅ New incremental data scraped successfully!")
+                st.text(result.stdout)
+
+                # Append only the new days to the store and move the last processed date forward
+                for geo, (added, watermark) in ingest().items():
+                    st.success(f"🧮 {geo}: appended {added} new days (last processed date {watermark})")
+
+                # Find latest downloaded CSV file
+                files = glob.glob(os.path.join(config.paths.incremental_dir, "*.csv"))
+                if files:
+                    latest_file = max(files, key=os.path.getctime)
+                    st.info(f"📄 Showing recently downloaded file: `{os.path.basename(latest_file)}`")
+
+                    # Read and show dataframe
+                    df = read_trends_frame(latest_file)
+                    st.dataframe(df)
+                else:
+                    st.warning("⚠️ No downloaded file found to display.")
+            else:
+                st.error("❌ Failed to scrape data.")
+                st.text(result.stderr)
 
-        if result.returncode == 0:
-            st.success("✅ New incremental data scraped successfully!")
-            st.text(result.stdout)
+    # Run fixed-reference rescaler (on demand rather than on every rerun)
+    st.info(f"📌 Rescaling daily chunks using reference: {ref_keyword}")
 
-            # Find latest downloaded CSV file
-            files = glob.glob("downloads_incremental/*.csv")
-            if files:
-                latest_file = max(files, key=os.path.getctime)
-                st.info(f"📄 Showing recently downloaded file: `{os.path.basename(latest_file)}`")
+    if st.button("🧷 Rescale with Fixed Reference"):
+        result = subprocess.run(
+            ["python", "rescale_chunks_fixed_reference.py", config.reference_keyword.name],
+            capture_output=True, text=True
+        )
 
-                # Read and show dataframe
-                df = pd.read_csv(latest_file)
-                st.dataframe(df)
-            else:
-                st.warning("⚠️ No downloaded file found to display.")
+        if result.returncode == 0:
+            st.success("✅ Daily data successfully rescaled using fixed reference.")
+            st.text(result.stdout)
         else:
-            st.error("❌ Failed to scrape data.")
+            st.error("❌ Failed to rescale daily data with fixed reference.")
             st.text(result.stderr)
 
-# Run fixed-reference rescaler
-REFERENCE_KEYWORD = "Combined Graduate Level Examination: (India)"
-st.info(f"📌 Rescaling daily chunks using reference: {REFERENCE_KEYWORD}")
-
-result = subprocess.run(
-    ["python", "rescale_chunks_fixed_reference.py", REFERENCE_KEYWORD],
-    capture_output=True, text=True
-)
-
-if result.returncode == 0:
-    st.success("✅ Daily data successfully rescaled using fixed reference.")
-    st.text(result.stdout)
-else:
-    st.error("❌ Failed to rescale daily data with fixed reference.")
-    st.text(result.stderr)
-
-st.markdown("### 📊 Scaling Factor Comparison (New Data vs. Historical Daily)")
+    st.markdown("### 📊 Scaling Factor Comparison (New Data vs. Historical Daily)")
 
-try:
-    # 1. Load historical data
-    df_hist = pd.read_csv("merged/5keywords_combined_daily_scaled.csv", parse_dates=["Day"])
+    try:
+        # 1. Find latest incremental file
+        incremental_files = sorted(glob.glob(os.path.join(config.paths.incremental_dir, f"geo_{config.primary_geo}_*.csv")), reverse=True)
+        if not incremental_files:
+            st.warning("⚠️ No new incremental file found.")
+            return
 
-    # 2. Find latest incremental file
-    incremental_files = sorted(glob.glob("downloads_incremental/geo_IN_*.csv"), reverse=True)
-    if not incremental_files:
-        st.warning("⚠️ No new incremental file found.")
-    else:
         latest_file = incremental_files[0]
-        df_new = pd.read_csv(latest_file, skiprows=1)  # skip metadata
-        df_new.rename(columns={df_new.columns[0]: "Day"}, inplace=True)
-        df_new["Day"] = pd.to_datetime(df_new["Day"])
+        df_new = read_trends_frame(latest_file, date_column="Day", dtype=np.float64)
+
+        # 2. Load only the overlapping part of the historical data
+        df_hist = load_daily(keywords, df_new["Day"].min().date(), df_new["Day"].max().date())
+        df_hist = df_hist.rename(columns={"Date": "Day"})
 
         # 3. Scaling factor calculation
         results = []
@@ -335,9 +432,9 @@ try:
                 continue
 
             merged = pd.merge(
-                df_hist[["Day", col]], 
-                df_new[["Day", col]], 
-                on="Day", 
+                df_hist[["Day", col]],
+                df_new[["Day", col]],
+                on="Day",
                 suffixes=("_hist", "_new")
             )
 
@@ -360,6 +457,40 @@ try:
         else:
             st.info("No matching keywords found for scaling comparison.")
 
-except Exception as e:
-    st.error("❌ Error comparing new and historical data.")
-    st.text(str(e))
\ No newline at end of file
+    except Exception as e:
+        st.error("❌ Error comparing new and historical data.")
+        st.text(str(e))
+
+
+SECTIONS = {
+    "📊 Trends": section_trends,
+    "📈 Keyword Detail": section_keyword_detail,
+    "📀 AUC Comparison": section_auc,
+    "🔍 Seasonality & Anomalies": section_analytics,
+    "🆕 Recent Updates": section_recent,
+    "🔄 Fetch & Rescale": section_fetch,
+}
+
+# === UI ===
+st.set_page_config(layout="wide")
+st.title("📊 Google Trends Comparison Dashboard")
+st.write("Comparison of original weekly and scaled daily data over 5 years.")
+
+# Get common keywords (header scan only, no data rows are read here)
+all_keywords = [kw for kw in read_columns(weekly_path) if kw in set(read_columns(daily_path))]
+bounds = [load_date_bounds(path, file_version(path)) for path in (weekly_path, daily_path)]
+min_date, max_date = min(b[0] for b in bounds), max(b[1] for b in bounds)
+
+# === Filters (pushed down into every loader) ===
+section = st.sidebar.radio("Section", list(SECTIONS))
+keywords = st.sidebar.multiselect("Keywords", all_keywords, default=all_keywords, format_func=config.label)
+date_range = st.sidebar.date_input("Date range", value=(min_date, max_date), min_value=min_date, max_value=max_date)
+
+if not keywords:
+    st.info("Select at least one keyword.")
+    st.stop()
+
+# The date picker returns a single date while a range is half-selected
+start, end = date_range if len(date_range) == 2 else (date_range[0], max_date)
+
+SECTIONS[section](keywords, start, end)
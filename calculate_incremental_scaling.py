@@ -1,19 +1,23 @@
-import pandas as pd
+import numpy as np
 import os
+from trends_config import load_registry
+from trends_csv import read_trends_frame
+
+config = load_registry()
+INCREMENTAL_DIR = config.paths.incremental_dir
 
 # Load old scaled data
-old_df = pd.read_csv("5keywords_combined_daily_scaled.csv", parse_dates=["date"])
+old_df = read_trends_frame(config.daily_scaled_file, date_column="date", dtype=np.float64)
 old_df.set_index("date", inplace=True)
 
 # Load latest incremental raw CSV
 latest_file = sorted(
-    [f for f in os.listdir("downloads_incremental") if f.endswith(".csv")],
-    key=lambda x: os.path.getctime(os.path.join("downloads_incremental", x)),
+    [f for f in os.listdir(INCREMENTAL_DIR) if f.endswith(".csv") and f != "rescaled_incremental.csv"],
+    key=lambda x: os.path.getctime(os.path.join(INCREMENTAL_DIR, x)),
     reverse=True
 )[0]
 
-new_df = pd.read_csv(os.path.join("downloads_incremental", latest_file), parse_dates=["Day"])
-new_df.rename(columns={"Day": "date"}, inplace=True)
+new_df = read_trends_frame(os.path.join(INCREMENTAL_DIR, latest_file), date_column="date", dtype=np.float64)
 new_df.set_index("date", inplace=True)
 
 # Intersect dates
@@ -51,5 +55,5 @@ for col, scale in scaling_factors.items():
     scaled_new_df[col] *= scale
 
 # Save rescaled incremental
-scaled_new_df.reset_index().to_csv("downloads_incremental/rescaled_incremental.csv", index=False)
+scaled_new_df.reset_index().to_csv(os.path.join(INCREMENTAL_DIR, "rescaled_incremental.csv"), index=False)
 print("✅ Saved scaled incremental data.")
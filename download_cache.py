@@ -0,0 +1,207 @@
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+
+# === CONFIGURATION ===
+CACHE_FOLDER = "cache"
+MAX_BYTES = 256 * 1024 * 1024
+LIVE_TTL = 6 * 60 * 60  # ranges that touch today (or "today 5-y") can still change
+
+
+# === QUERY NORMALIZATION ===
+def make_query(geo, keywords, start=None, end=None, date=None, gprop="youtube"):
+    # Either an explicit start/end span or a relative Trends date such as "today 5-y"
+    if date is None:
+        date = f"{start} {end}"
+    return {
+        "geo": geo.strip().upper(),
+        "gprop": gprop,
+        "keywords": sorted(k.strip() for k in keywords),
+        "date": " ".join(date.split()),
+    }
+
+
+def query_span(query):
+    # (start, end) dates for explicit spans, None for relative ones
+    parts = query["date"].split()
+    if len(parts) != 2 or parts[0] == "today":
+        return None
+    try:
+        return datetime.date.fromisoformat(parts[0]), datetime.date.fromisoformat(parts[1])
+    except ValueError:
+        return None
+
+
+def is_live(query, today=None):
+    span = query_span(query)
+    return span is None or span[1] >= (today or datetime.date.today())
+
+
+def cache_key(query, today=None):
+    # Historical spans never change, so they are keyed on the query alone.
+    # Live spans also include the fetch date: yesterday's "today 5-y" is a different dataset.
+    parts = dict(query)
+    if is_live(query, today):
+        parts["fetched"] = str(today or datetime.date.today())
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+# === SLICING ===
+def slice_csv(data, start, end):
+    # Keep the preamble and header, drop data rows outside [start, end]
+    lines = data.decode("utf-8-sig").splitlines(keepends=True)
+    out = []
+    in_rows = False
+    for line in lines:
+        first = line.split(",", 1)[0].strip()
+        if not in_rows:
+            out.append(line)
+            in_rows = first.lower() in ("day", "week", "month")
+            continue
+        try:
+            day = datetime.date.fromisoformat(first)
+        except ValueError:
+            out.append(line)
+            continue
+        if start <= day <= end:
+            out.append(line)
+    return "".join(out).encode("utf-8")
+
+
+# === CACHE ===
+class DownloadCache:
+    # Raw CSV bodies are stored once per content hash under cache/raw/; cache/index.json maps query keys to blobs
+    # with access times and expiry. Least recently used entries are evicted once the blobs exceed max_bytes.
+    def __init__(self, folder=CACHE_FOLDER, max_bytes=MAX_BYTES, live_ttl=LIVE_TTL):
+        self.folder = folder
+        self.raw_folder = os.path.join(folder, "raw")
+        self.index_path = os.path.join(folder, "index.json")
+        self.max_bytes = max_bytes
+        self.live_ttl = live_ttl
+        self._lock = threading.Lock()
+        os.makedirs(self.raw_folder, exist_ok=True)
+        self.index = self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+    def _blob_path(self, blob):
+        return os.path.join(self.raw_folder, f"{blob}.csv")
+
+    def _read(self, key, entry):
+        path = self._blob_path(entry["blob"])
+        expired = entry.get("expires") is not None and entry["expires"] < time.time()
+        if expired or not os.path.exists(path):
+            self._drop(key)
+            return None
+        entry["accessed"] = time.time()
+        with open(path, "rb") as f:
+            return f.read()
+
+    def _drop(self, key):
+        entry = self.index.pop(key, None)
+        if entry and not any(e["blob"] == entry["blob"] for e in self.index.values()):
+            try:
+                os.remove(self._blob_path(entry["blob"]))
+            except FileNotFoundError:
+                pass
+
+    def get(self, query, allow_superset=False, today=None):
+        with self._lock:
+            key = cache_key(query, today)
+            data = self._read(key, self.index[key]) if key in self.index else None
+            if data is None and allow_superset:
+                data = self._covering(query, today)
+            if data is not None:
+                self._save_index()
+            return data
+
+    def _covering(self, query, today):
+        # An entry for the same geo/property/keywords whose span contains the requested one. Trends normalizes each
+        # response to its own maximum, so callers must re-anchor the slice (the incremental path already does).
+        span = query_span(query)
+        if span is None:
+            return None
+        live = is_live(query, today)
+        fetched = str(today or datetime.date.today())
+        for key, entry in sorted(self.index.items(), key=lambda kv: -kv[1]["accessed"]):
+            other = entry["query"]
+            if (other["geo"], other["gprop"], other["keywords"]) != (query["geo"], query["gprop"], query["keywords"]):
+                continue
+            other_span = query_span(other)
+            if other_span is None or not (other_span[0] <= span[0] and span[1] <= other_span[1]):
+                continue
+            if live and entry.get("fetched") != fetched:
+                continue
+            data = self._read(key, entry)
+            if data is not None:
+                return slice_csv(data, *span)
+        return None
+
+    def put(self, query, data, today=None):
+        with self._lock:
+            key = cache_key(query, today)
+            blob = hashlib.sha256(data).hexdigest()
+            path = self._blob_path(blob)
+            if not os.path.exists(path):
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            now = time.time()
+            live = is_live(query, today)
+            self.index[key] = {
+                "query": query,
+                "blob": blob,
+                "size": len(data),
+                "created": now,
+                "accessed": now,
+                "fetched": str(today or datetime.date.today()),
+                "expires": now + self.live_ttl if live else None,
+            }
+            self._evict()
+            self._save_index()
+            return path
+
+    def _evict(self):
+        blobs = {}
+        for entry in self.index.values():
+            blobs[entry["blob"]] = entry["size"]
+        total = sum(blobs.values())
+        for key, entry in sorted(self.index.items(), key=lambda kv: kv[1]["accessed"]):
+            if total <= self.max_bytes:
+                break
+            blob = entry["blob"]
+            self._drop(key)
+            if blob in blobs and not any(e["blob"] == blob for e in self.index.values()):
+                total -= blobs.pop(blob)
+
+
+def restore(cache, query, path, allow_superset=False):
+    # Writes a cached response to `path`; returns False when the scraper has to download it
+    data = cache.get(query, allow_superset)
+    if data is None:
+        return False
+    with open(path, "wb") as f:
+        f.write(data)
+    return True
+
+
+def store(cache, query, path):
+    with open(path, "rb") as f:
+        cache.put(query, f.read())
@@ -0,0 +1,112 @@
+import datetime
+import hashlib
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+# Local stand-in for the Trends CSV export, used to exercise fetch_orchestrator.py without a browser or quota.
+# GET /trends/api/export?geo=IN&q=/g/a,/g/b&date=2025-07-01 2025-07-11&gprop=youtube
+# returns a file shaped like multiTimeline.csv (preamble, Day/Week header, values scaled so the max is 100).
+
+EXPORT_PATH = "/trends/api/export"
+DAILY_LIMIT_DAYS = 270  # longer spans come back weekly, like the real site
+
+
+def _span(date_param, today=None):
+    today = today or datetime.date.today()
+    parts = date_param.split()
+    if len(parts) == 2 and parts[0] == "today":
+        years = int(parts[1].rstrip("-y")) if parts[1].endswith("-y") else 5
+        return today - datetime.timedelta(days=365 * years), today
+    return datetime.date.fromisoformat(parts[0]), datetime.date.fromisoformat(parts[1])
+
+
+def render_csv(geo, keywords, date_param, today=None):
+    start, end = _span(date_param, today)
+    weekly = (end - start).days > DAILY_LIMIT_DAYS
+    if weekly:
+        start = start - datetime.timedelta(days=(start.weekday() + 1) % 7)
+        dates = np.arange(np.datetime64(start), np.datetime64(end) + 1, 7)
+    else:
+        dates = np.arange(np.datetime64(start), np.datetime64(end) + 1)
+
+    # Deterministic series per keyword: yearly seasonality + weekly wobble, same for every request
+    t = dates.astype(int).astype(float)
+    columns = []
+    for kw in keywords:
+        seed = int(hashlib.md5(kw.encode("utf-8")).hexdigest()[:8], 16)
+        phase = seed % 365
+        level = 20 + seed % 60
+        series = level * (1 + 0.5 * np.sin(2 * np.pi * (t - phase) / 365.25)) * (1 + 0.1 * np.sin(2 * np.pi * t / 7))
+        columns.append(series)
+    values = np.vstack(columns).T if columns else np.empty((len(dates), 0))
+    peak = values.max() if values.size else 1
+    values = np.rint(values / peak * 100).astype(int)
+
+    lines = ["Category: All categories", "", ",".join(["Week" if weekly else "Day"] + [f"{kw}: ({geo})" for kw in keywords])]
+    for day, row in zip(dates, values):
+        lines.append(",".join([str(day)] + ["<1" if v == 0 else str(v) for v in row]))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class FakeTrendsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != EXPORT_PATH:
+            self.send_error(404)
+            return
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        server = self.server
+        with server.stats_lock:
+            server.request_count += 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            server.request_log.append((time.monotonic(), params.get("date", "")))
+        try:
+            time.sleep(server.latency)
+            try:
+                body = render_csv(params.get("geo", ""), [k for k in params.get("q", "").split(",") if k],
+                                  params.get("date", "today 5-y"))
+            except ValueError:
+                self.send_error(400)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.stats_lock:
+                server.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_server(latency=0.2, host="127.0.0.1", port=0):
+    # Serves in a background thread; returns (server, base_url). Call server.shutdown() when done.
+    server = ThreadingHTTPServer((host, port), FakeTrendsHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.stats_lock = threading.Lock()
+    server.request_count = 0
+    server.active = 0
+    server.max_active = 0
+    server.request_log = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    server, base_url = start_fake_server(port=port)
+    print(f"🧪 Fake Trends server on {base_url}{EXPORT_PATH} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
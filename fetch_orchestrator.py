@@ -0,0 +1,338 @@
+import asyncio
+import csv
+import os
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from urllib.parse import quote_plus, urlencode, urlparse
+import numpy as np
+import pandas as pd
+from download_cache import DownloadCache, cache_key, make_query
+from merge_chunks import accumulate, file_pattern, format_block
+from trends_config import load_registry
+from trends_csv import parse_trends_csv
+
+# Runs many (geo, keyword batch, date range) fetches concurrently:
+# - at most `concurrency` downloads are in flight (asyncio.Semaphore)
+# - identical queries that are already in flight share one download
+# - request starts to the same host are spaced at least `min_interval` seconds apart
+# - every finished download is written, parsed and merged immediately, while the rest are still running; at the end
+#   each chunk group's merged file is written in the same format as merge_chunks.py
+# Fetchers are async callables query -> bytes with a `host` attribute: HttpFetcher talks to an export endpoint
+# (the local fake server in fake_trends_server.py), BrowserFetcher drives Chrome through trends_browser.py.
+
+# === CONFIGURATION ===
+config = load_registry()
+CONCURRENCY = 4
+MIN_INTERVAL = 1.0   # seconds between request starts per host
+RETRIES = 3
+BACKOFF = 2.0
+
+
+# === FETCHERS ===
+class HttpFetcher:
+    def __init__(self, base_url, timeout=60, retries=RETRIES, backoff=BACKOFF):
+        self.base_url = base_url.rstrip("/")
+        self.host = urlparse(self.base_url).netloc
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+    def url(self, query):
+        params = {"geo": query["geo"], "q": ",".join(query["keywords"]), "date": query["date"], "gprop": query["gprop"]}
+        return f"{self.base_url}/trends/api/export?{urlencode(params)}"
+
+    def _get(self, url):
+        with urllib.request.urlopen(url, timeout=self.timeout) as response:
+            return response.read()
+
+    async def __call__(self, query):
+        url = self.url(query)
+        for attempt in range(self.retries + 1):
+            try:
+                return await asyncio.to_thread(self._get, url)
+            except urllib.error.HTTPError as e:
+                # Rate limited or server trouble: back off and retry, anything else is final
+                if e.code not in (429, 500, 502, 503) or attempt == self.retries:
+                    raise
+                await asyncio.sleep(self.backoff * (attempt + 1))
+
+
+class BrowserFetcher:
+    # One Chrome per concurrent slot, each downloading into its own folder so multiTimeline.csv never collides
+    host = "trends.google.com"
+
+    def __init__(self, download_root, chrome_profile="", page_wait=5):
+        self.download_root = download_root
+        self.chrome_profile = chrome_profile
+        self.page_wait = page_wait
+        self._drivers = asyncio.Queue()
+        self._started = []
+
+    def url(self, query):
+        q_param = ",".join(quote_plus(k) for k in query["keywords"])
+        date = query["date"].replace(" ", "%20")
+        return f"https://trends.google.com/trends/explore?date={date}&geo={query['geo']}&gprop={query['gprop']}&q={q_param}&hl=en"
+
+    def _download(self, driver, folder, url):
+        from trends_browser import DOWNLOAD_NAME, captcha_check, click_download_button, wait_for_download
+
+        path = os.path.join(folder, DOWNLOAD_NAME)
+        if os.path.exists(path):
+            os.remove(path)
+        driver.get(url)
+        time.sleep(self.page_wait)
+        captcha_check(driver)
+        click_download_button(driver)
+        if not wait_for_download(path, timeout=30):
+            raise TimeoutError(f"Download failed or timeout: {url}")
+        with open(path, "rb") as f:
+            data = f.read()
+        os.remove(path)
+        return data
+
+    async def _acquire(self):
+        if self._drivers.empty():
+            from trends_browser import start_driver
+
+            folder = os.path.join(self.download_root, f"slot_{len(self._started)}")
+            os.makedirs(folder, exist_ok=True)
+            # Each slot needs its own profile directory: Chrome refuses to share one between instances
+            profile = f"{self.chrome_profile}_{len(self._started)}" if self.chrome_profile and self._started else self.chrome_profile
+            driver = await asyncio.to_thread(start_driver, folder, profile)
+            self._started.append(driver)
+            return driver, folder
+        return await self._drivers.get()
+
+    async def __call__(self, query):
+        driver, folder = await self._acquire()
+        try:
+            return await asyncio.to_thread(self._download, driver, folder, self.url(query))
+        finally:
+            self._drivers.put_nowait((driver, folder))
+
+    def close(self):
+        for driver in self._started:
+            driver.quit()
+        self._started = []
+
+
+# === ORCHESTRATOR ===
+class FetchOrchestrator:
+    def __init__(self, fetcher, concurrency=CONCURRENCY, min_interval=MIN_INTERVAL, cache=None, allow_superset=False):
+        self.fetcher = fetcher
+        self.concurrency = concurrency
+        self.min_interval = min_interval
+        self.cache = cache
+        self.allow_superset = allow_superset
+        self._semaphore = None
+        self._in_flight = {}
+        self._host_locks = {}
+        self._host_next = {}
+        self.stats = {"requests": 0, "fetched": 0, "cached": 0, "coalesced": 0}
+
+    async def _pace(self, host):
+        # Reserve the next start slot for this host; waiting happens outside the lock so slots queue up in order
+        lock = self._host_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            start = max(now, self._host_next.get(host, now))
+            self._host_next[host] = start + self.min_interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def _fetch(self, query):
+        if self.cache is not None:
+            data = await asyncio.to_thread(self.cache.get, query, self.allow_superset)
+            if data is not None:
+                self.stats["cached"] += 1
+                return data
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            await self._pace(getattr(self.fetcher, "host", ""))
+            data = await self.fetcher(query)
+        self.stats["fetched"] += 1
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.put, query, data)
+        return data
+
+    async def fetch(self, query):
+        self.stats["requests"] += 1
+        key = cache_key(query)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = self._in_flight[key] = asyncio.ensure_future(self._fetch(query))
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+        # shield: one caller being cancelled must not cancel the download for the others
+        return await asyncio.shield(task)
+
+    async def stream(self, queries):
+        # Yields (query, data, error) in completion order
+        async def run(query):
+            try:
+                return query, await self.fetch(query), None
+            except Exception as e:
+                return query, None, e
+
+        for finished in asyncio.as_completed([run(q) for q in queries]):
+            yield await finished
+
+
+# === STREAMING PARSE / MERGE ===
+class RunningMerge:
+    # Per-day sums and counts per column for one chunk group, updated as each chunk arrives. frame() gives the same
+    # result as merge_chunks.py (average of overlapping days) without holding every chunk in memory.
+    def __init__(self):
+        self.columns = []
+        self.days = np.array([], dtype="datetime64[D]")
+        self.sums = np.zeros((0, 0))
+        self.counts = np.zeros((0, 0))
+
+    def add(self, table):
+        # Keywords seen for the first time get new (empty) columns; the chunk is then added like in merge_chunks.py
+        new = [col for col in table.columns if col not in self.columns]
+        if new:
+            self.columns += new
+            self.sums = np.hstack([self.sums, np.zeros((len(self.days), len(new)))])
+            self.counts = np.hstack([self.counts, np.zeros((len(self.days), len(new)))])
+        index = {col: i for i, col in enumerate(self.columns)}
+        positions = np.array([index[col] for col in table.columns], dtype=int)
+        self.days, self.sums, self.counts = accumulate(self.days, self.sums, self.counts,
+                                                       table._replace(values=table.values.astype(np.float64)),
+                                                       positions)
+
+    def means(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.sums / self.counts
+
+    def frame(self, date_column="Day"):
+        df = pd.DataFrame(self.means(), columns=self.columns)
+        df.insert(0, date_column, self.days.astype(str))
+        return df
+
+    def write(self, output_file):
+        # Same file merge_chunks.merge_group writes for the group, so that step can be skipped after a fetch
+        tmp_path = output_file + ".tmp"
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerow(["Day"] + self.columns)
+            f.write(format_block(self.days, self.means()))
+        os.replace(tmp_path, output_file)
+        return len(self.days)
+
+
+def chunk_group(path):
+    # Chunk file prefix (e.g. '5keywords'), the group merge_chunks.py merges it into
+    match = file_pattern.match(os.path.basename(path))
+    return match.group(1) if match else os.path.splitext(os.path.basename(path))[0]
+
+
+async def fetch_and_merge(orchestrator, jobs, merges=None, on_table=None):
+    # jobs: list of (query, output_path). Each download is saved and parsed as soon as it lands and added to the
+    # RunningMerge of its chunk group; returns ({group: RunningMerge}, failed queries).
+    merges = merges if merges is not None else {}
+    paths = {}
+    for query, path in jobs:
+        paths.setdefault(cache_key(query), []).append(path)
+    failed = []
+    async for query, data, error in orchestrator.stream([query for query, _ in jobs]):
+        if error is not None:
+            print(f"❌ {query['geo']} {query['date']}: {error}")
+            failed.append(query)
+            continue
+        path = paths[cache_key(query)].pop(0)
+        table = await asyncio.to_thread(_save_and_parse, path, data)
+        if table.date_label == "Day":
+            merges.setdefault(chunk_group(path), RunningMerge()).add(table)
+        if on_table is not None:
+            on_table(query, path, table)
+        print(f"📥 Saved: {os.path.basename(path)} ({len(table.dates)} rows)")
+    return merges, failed
+
+
+def _save_and_parse(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return parse_trends_csv(path, dtype=np.float64)
+
+
+# === JOB PLANNING ===
+def chunk_jobs(output_dir, years=5, today=None):
+    # Same ranges and file names as google_trends_6m_daily_chunks.py, one keyword batch per geo
+    from aggregate_cube import fetch_ranges
+
+    ranges = fetch_ranges(today or datetime.now(), years)
+    jobs = []
+    for geo, keywords in config.by_geo().items():
+        topic_ids = list(dict.fromkeys(k.topic_id for k in keywords))
+        prefix = config.group_name if geo == config.primary_geo else f"{config.group_name}_{geo}"
+        for s, e in ranges:
+            date_start, date_end = s.strftime("%Y-%m-%d"), e.strftime("%Y-%m-%d")
+            query = make_query(geo, topic_ids, date_start, date_end, gprop=config.gprop)
+            jobs.append((query, os.path.join(output_dir, f"{prefix}_{date_start}_to_{date_end}.csv")))
+    return jobs
+
+
+if __name__ == "__main__":
+    # Usage: python fetch_orchestrator.py [--fake | --base-url URL] [--concurrency N] [--interval SECONDS]
+    args = sys.argv[1:]
+
+    def option(name, default):
+        return args[args.index(name) + 1] if name in args else default
+
+    concurrency = int(option("--concurrency", CONCURRENCY))
+    interval = float(option("--interval", MIN_INTERVAL))
+    output_dir = config.paths.daily_chunks_dir
+    merged_dir = config.paths.merged_dir
+    os.makedirs(output_dir, exist_ok=True)
+
+    server = None
+    if "--fake" in args:
+        from fake_trends_server import start_fake_server
+
+        server, base_url = start_fake_server()
+        # Fake data must never land next to the real chunks
+        output_dir = option("--output", tempfile.mkdtemp(prefix="fake_trends_"))
+        merged_dir = os.path.join(output_dir, "merged")
+        os.makedirs(output_dir, exist_ok=True)
+        fetcher, cache = HttpFetcher(base_url), None
+        print(f"🧪 Using fake Trends server at {base_url}")
+    elif "--base-url" in args:
+        fetcher, cache = HttpFetcher(option("--base-url", "")), DownloadCache(config.paths.cache_dir)
+    else:
+        fetcher = BrowserFetcher(os.path.join(output_dir, "_browser"), config.chrome_profile)
+        cache = DownloadCache(config.paths.cache_dir)
+
+    jobs = chunk_jobs(output_dir)
+    orchestrator = FetchOrchestrator(fetcher, concurrency=concurrency, min_interval=interval, cache=cache)
+    started = time.perf_counter()
+    try:
+        merges, failed = asyncio.run(fetch_and_merge(orchestrator, jobs))
+    finally:
+        if isinstance(fetcher, BrowserFetcher):
+            fetcher.close()
+        if server is not None:
+            server.shutdown()
+
+    elapsed = time.perf_counter() - started
+    print(f"\n✅ {len(jobs) - len(failed)}/{len(jobs)} ranges in {elapsed:.1f}s "
+          f"(fetched {orchestrator.stats['fetched']}, cached {orchestrator.stats['cached']}, "
+          f"coalesced {orchestrator.stats['coalesced']})")
+    os.makedirs(merged_dir, exist_ok=True)
+    # A group with a failed range would be missing those days, so its merged file is left as it is
+    failed_groups = {chunk_group(path) for query, path in jobs if query in failed}
+    for group in sorted(failed_groups):
+        print(f"⚠️ {group}: some ranges failed; run merge_chunks.py once they are fetched")
+    for group, merge in merges.items():
+        if group in failed_groups:
+            continue
+        output_file = os.path.join(merged_dir, f"{group}_combined_daily.csv")
+        n_days = merge.write(output_file)
+        print(f"✅ Saved merged file: {output_file} ({n_days} days, {len(merge.columns)} keywords)")
@@ -1,69 +1,116 @@
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from aggregate_cube import PERIOD_FREQ, half_year_start
+from trends_config import load_registry
+from trends_csv import read_trends_frame
 
 # === CONFIGURATION ===
-daily_file = os.path.join("merged", "5keywords_combined_daily.csv")
-weekly_file = os.path.join("downloads_compare", f"geo_IN_compare.csv")
-output_file = os.path.join("merged", "5keywords_combined_daily_scaled.csv")
-step_months = 6
-
-# === LOAD DAILY DATA ===
-daily_df = pd.read_csv(daily_file)
-daily_df["Day"] = pd.to_datetime(daily_df["Day"])
-
-# === LOAD WEEKLY DATA === (skip first 2 metadata lines)
-weekly_df = pd.read_csv(weekly_file, skiprows=2)
-# Convert Week column to datetime
-weekly_df["Week"] = pd.to_datetime(weekly_df["Week"])
-
-# === Identify common trend columns (ignore date) ===
-data_columns = [col for col in daily_df.columns if col != "Day"]
-
-# === Define date range for chunking ===
-start_date = daily_df["Day"].min()
-end_date = daily_df["Day"].max()
-
-current = start_date
-scaled_chunks = []
-
-# === SCALE EACH 6-MONTH CHUNK ===
-while current < end_date:
-    next_date = current + timedelta(days=30 * step_months)
-    chunk_end = min(next_date, end_date)
-
-    daily_chunk = daily_df[(daily_df["Day"] >= current) & (daily_df["Day"] < chunk_end)].copy()
-    weekly_chunk = weekly_df[(weekly_df["Week"] >= current) & (weekly_df["Week"] < chunk_end)]
-
-    if daily_chunk.empty or weekly_chunk.empty:
-        print(f"⚠️ Skipping chunk {current.date()} to {chunk_end.date()} — no data")
-        current = next_date
-        continue
-
-    print(f"🔄 Scaling chunk: {current.date()} → {chunk_end.date()}")
-
-    for col in data_columns:
-        # Ensure numeric data for both daily and weekly
-        daily_chunk[col] = pd.to_numeric(daily_chunk[col], errors="coerce")
-        weekly_chunk[col] = pd.to_numeric(weekly_chunk[col], errors="coerce")
-
-        daily_avg = daily_chunk[col].mean()
-        weekly_avg = weekly_chunk[col].mean()
-
-        if pd.isna(daily_avg) or daily_avg == 0:
-            scale_factor = 1
-        else:
-            scale_factor = weekly_avg / daily_avg
-
-        daily_chunk[col] = daily_chunk[col] * scale_factor
-
-    scaled_chunks.append(daily_chunk)
-    current = next_date
-
-# === MERGE AND SAVE FINAL OUTPUT ===
-final_df = pd.concat(scaled_chunks)
-final_df.sort_values("Day", inplace=True)
-final_df.reset_index(drop=True, inplace=True)
-final_df.to_csv(output_file, index=False)
-
-print(f"\n✅ Done! Rescaled daily file saved as: {output_file}")
+# One partition per (daily merged file, weekly compare file) pair; extra triples can be passed on the command line
+config = load_registry()
+PARTITIONS = [(config.daily_file, config.weekly_file, config.daily_scaled_file)]
+MAX_WORKERS = os.cpu_count() or 1
+
+
+# === CHUNKING ===
+def chunk_edges(start, end):
+    # Whole calendar half-years (Jan 1 / Jul 1) covering start..end, the same boundaries as the default AUC windows;
+    # the outer chunks are not clipped to the data so they keep every weekly row of their half-year
+    edges = pd.date_range(half_year_start(pd.Timestamp(start).normalize()), pd.Timestamp(end).normalize() + pd.DateOffset(months=6), freq=PERIOD_FREQ["6month"])
+    return edges.to_numpy().astype("datetime64[D]")
+
+
+def assign_chunks(dates, edges):
+    # Chunk index of every date in one searchsorted call; -1 for dates outside [edges[0], edges[-1])
+    idx = np.searchsorted(edges, dates, side="right") - 1
+    idx[(dates < edges[0]) | (dates >= edges[-1])] = -1
+    return idx
+
+
+# === RESCALING ===
+def rescale(daily_df, weekly_df, edges):
+    data_columns = [col for col in daily_df.columns if col != "Day"]
+    daily_dates = daily_df["Day"].to_numpy().astype("datetime64[D]")
+    weekly_dates = weekly_df["Week"].to_numpy().astype("datetime64[D]")
+    daily_chunk = assign_chunks(daily_dates, edges)
+    weekly_chunk = assign_chunks(weekly_dates, edges)
+
+    # All chunk means for all columns in one groupby each (NaN-skipping, like Series.mean())
+    daily_means = daily_df[data_columns].groupby(daily_chunk).mean()
+    weekly_means = weekly_df[data_columns].groupby(weekly_chunk).mean()
+    daily_means = daily_means.drop(index=-1, errors="ignore")
+    weekly_means = weekly_means.drop(index=-1, errors="ignore")
+
+    # Chunks without daily or weekly data are skipped, as before
+    chunks = daily_means.index.intersection(weekly_means.index)
+    daily_means = daily_means.loc[chunks]
+    weekly_means = weekly_means.loc[chunks]
+    factors = weekly_means / daily_means
+    factors = factors.mask(daily_means.isna() | (daily_means == 0), 1.0)
+
+    for chunk in range(len(edges) - 1):
+        if chunk not in chunks:
+            print(f"⚠️ Skipping chunk {edges[chunk]} to {edges[chunk + 1]} — no data")
+
+    # One broadcast multiply: each row picks its chunk's factor row
+    keep = np.isin(daily_chunk, chunks)
+    positions = factors.index.get_indexer(daily_chunk[keep])
+    scaled_values = daily_df.loc[keep, data_columns].to_numpy(dtype=np.float64) * factors.to_numpy()[positions]
+
+    final_df = pd.DataFrame(scaled_values, columns=data_columns)
+    final_df.insert(0, "Day", daily_df.loc[keep, "Day"].to_numpy())
+    final_df.sort_values("Day", inplace=True, kind="stable")
+    final_df.reset_index(drop=True, inplace=True)
+
+    report = pd.DataFrame({
+        "Chunk Start": np.repeat(edges[chunks.to_numpy()], len(data_columns)),
+        "Chunk End": np.repeat(edges[chunks.to_numpy() + 1], len(data_columns)),
+        "Keyword": np.tile(data_columns, len(chunks)),
+        "Daily Mean": daily_means.to_numpy().ravel(),
+        "Weekly Mean": weekly_means.to_numpy().ravel(),
+        "Scale Factor": factors.to_numpy().ravel(),
+    })
+    return final_df, report
+
+
+def report_path(output_file):
+    return output_file[:-len(".csv")] + "_scale_factors.csv" if output_file.endswith(".csv") else output_file + ".factors.csv"
+
+
+def rescale_partition(daily_file, weekly_file, output_file):
+    # === LOAD DAILY DATA ===
+    daily_df = read_trends_frame(daily_file, dtype=np.float64)
+
+    # === LOAD WEEKLY DATA === ("<1" stays missing so it is left out of the weekly mean)
+    weekly_df = read_trends_frame(weekly_file, less_than_one=np.nan, dtype=np.float64)
+
+    edges = chunk_edges(daily_df["Day"].min(), daily_df["Day"].max())
+    final_df, report = rescale(daily_df, weekly_df, edges)
+
+    # === SAVE OUTPUT AND PER-CHUNK SCALE FACTORS ===
+    final_df.to_csv(output_file, index=False)
+    report.to_csv(report_path(output_file), index=False)
+    return output_file, len(edges) - 1, len(final_df)
+
+
+def run(partitions, max_workers=MAX_WORKERS):
+    # Partitions are independent, so several geos / keyword groups are rescaled across processes
+    if len(partitions) > 1 and max_workers > 1:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(partitions))) as pool:
+            return list(pool.map(rescale_partition, *zip(*partitions)))
+    return [rescale_partition(*partition) for partition in partitions]
+
+
+if __name__ == "__main__":
+    # Usage: python google_trends_5y_daily_rescaled.py [daily.csv weekly.csv output.csv ...]
+    args = sys.argv[1:]
+    if args and len(args) % 3:
+        print("[ERROR] Pass partitions as daily.csv weekly.csv output.csv triples.")
+        sys.exit(1)
+    partitions = [tuple(args[i:i + 3]) for i in range(0, len(args), 3)] or PARTITIONS
+
+    for output_file, n_chunks, n_rows in run(partitions):
+        print(f"✅ Done! Rescaled {n_rows} days in {n_chunks} chunks: {output_file}")
+        print(f"📏 Scale factors per chunk: {report_path(output_file)}")
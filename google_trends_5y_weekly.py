@@ -1,16 +1,14 @@
-import csv
 import os
 import time
 import sys
 from urllib.parse import quote_plus
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from download_cache import DownloadCache, make_query, restore, store
+from trends_browser import DOWNLOAD_NAME, captcha_check, click_download_button, start_driver, wait_for_download
+from trends_config import load_registry, read_keywords
 
-CSV_FILE = sys.argv[1] if len(sys.argv) > 1 else "keywords.csv"
-OUTPUT_DIR = "downloads_compare"
+config = load_registry()
+CSV_FILE = sys.argv[1] if len(sys.argv) > 1 else config.paths.keywords_csv
+OUTPUT_DIR = config.paths.weekly_dir
 WAIT_TIME = 5
 
 # Step 1: Clean output folder
@@ -20,86 +18,59 @@ if os.path.exists(OUTPUT_DIR):
 else:
     os.makedirs(OUTPUT_DIR)
 
-# Step 2: Setup Chrome with download folder
-options = Options()
-options.add_argument("--user-data-dir=C:/Users/lenovo/ChromeProfile")  # Update if needed
-prefs = {
-    "download.default_directory": os.path.abspath(OUTPUT_DIR),
-    "profile.default_content_settings.popups": 0,
-    "download.prompt_for_download": False,
-    "safebrowsing.enabled": True
-}
-options.add_experimental_option("prefs", prefs)
-driver = webdriver.Chrome(options=options)
+# Step 2: Chrome is started on the first cache miss only
+driver = None
+cache = DownloadCache(config.paths.cache_dir)
 
-# Step 3: Wait for download to complete
-def wait_for_download(file_path, timeout=20):
-    waited = 0
-    while not os.path.exists(file_path) and waited < timeout:
-        time.sleep(1)
-        waited += 1
-    return os.path.exists(file_path)
-
-# Step 4: Click download
-def click_download_button(driver):
-    try:
-        print("⬇️ Looking for download button...")
-        download_btn = WebDriverWait(driver, 20).until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, "button.widget-actions-item.export[title='CSV']"))
-        )
-        driver.execute_script("arguments[0].click();", download_btn)
-        print("✅ Download initiated.")
-    except Exception as e:
-        print(f"❌ Download button error: {e}")
-
-# Step 5: Load CSV data
+# Step 3: Load keywords
 if not os.path.exists(CSV_FILE):
     print(f"❌ CSV file not found: {CSV_FILE}")
-    driver.quit()
     exit()
 
 data_by_geo = {}
-with open(CSV_FILE, newline='', encoding='utf-8') as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        geo = row['geo']
-        if geo not in data_by_geo:
-            data_by_geo[geo] = []
-        data_by_geo[geo].append(row['google_trends_keywords'])
+for keyword in read_keywords(CSV_FILE):
+    data_by_geo.setdefault(keyword.geo, []).append(keyword.topic_id)
 
-# Step 6: Process each geo group
+# Step 4: Process each geo group
 for geo, topic_codes in data_by_geo.items():
     if len(topic_codes) < 2:
         print(f"⚠️ Skipping geo '{geo}' — less than 2 keywords.")
         continue
 
     q_param = ",".join(quote_plus(code.strip()) for code in topic_codes)
-    url = f"https://trends.google.com/trends/explore?date=today%205-y&geo={geo}&gprop=youtube&q={q_param}&hl=en"
+    url = f"https://trends.google.com/trends/explore?date=today%205-y&geo={geo}&gprop={config.gprop}&q={q_param}&hl=en"
+    new_path = config.paths.weekly_file(geo)
+    new_name = os.path.basename(new_path)
+    query = make_query(geo, topic_codes, date="today 5-y", gprop=config.gprop)
 
     print(f"\n📊 Comparing topics for geo '{geo}'")
+    if restore(cache, query, new_path):
+        print(f"📦 Restored from cache: {new_name}")
+        continue
+
     print("🔗", url)
+    if driver is None:
+        driver = start_driver(OUTPUT_DIR, config.chrome_profile)
     driver.get(url)
     time.sleep(5)
 
     # CAPTCHA check
-    if "robot" in driver.page_source.lower() or "captcha" in driver.page_source.lower():
-        print("🤖 CAPTCHA triggered. Please solve manually...")
-        input("🔓 Press Enter after solving CAPTCHA...")
+    captcha_check(driver)
 
     # Download
     click_download_button(driver)
-    downloaded_file = os.path.join(OUTPUT_DIR, "multiTimeline.csv")
-    new_name = f"geo_{geo}_compare.csv"
-    new_path = os.path.join(OUTPUT_DIR, new_name)
+    downloaded_file = os.path.join(OUTPUT_DIR, DOWNLOAD_NAME)
 
     if wait_for_download(downloaded_file):
         if os.path.exists(new_path):
             os.remove(new_path)
         os.rename(downloaded_file, new_path)
+        store(cache, query, new_path)
         print(f"📥 Saved as {new_name}")
     else:
         print(f"❌ Download failed or timed out for geo: {geo}")
 
     time.sleep(WAIT_TIME)
 
-driver.quit()
+if driver is not None:
+    driver.quit()
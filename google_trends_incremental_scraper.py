@@ -1,14 +1,10 @@
-import csv
 import os
 import sys
 import time
-import datetime
 from urllib.parse import quote_plus
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from download_cache import DownloadCache, make_query, restore, store
+from trends_browser import DOWNLOAD_NAME, captcha_check, click_download_button, start_driver, wait_for_download
+from trends_config import load_registry
 
 # ========== CLI DATE RANGE ==========
 if len(sys.argv) < 3:
@@ -20,57 +16,19 @@ start_date = sys.argv[1]
 end_date = sys.argv[2]
 
 # ========== CONFIG ==========
-CSV_FILE = "keywords.csv"
-OUTPUT_DIR = "downloads_incremental"
+config = load_registry()
+OUTPUT_DIR = config.paths.incremental_dir
 WAIT_TIME = 5
 
 # ========== SETUP ==========
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-# Chrome setup
-options = Options()
-options.add_argument("--user-data-dir=C:/Users/lenovo/ChromeProfile")  # ✅ Your existing profile
-prefs = {
-    "download.default_directory": os.path.abspath(OUTPUT_DIR),
-    "profile.default_content_settings.popups": 0,
-    "download.prompt_for_download": False,
-    "safebrowsing.enabled": True
-}
-options.add_experimental_option("prefs", prefs)
-driver = webdriver.Chrome(options=options)
-
-def wait_for_download(file_path, timeout=20):
-    waited = 0
-    while not os.path.exists(file_path) and waited < timeout:
-        time.sleep(1)
-        waited += 1
-    return os.path.exists(file_path)
-
-def click_download_button(driver):
-    try:
-        print(" Looking for download button...")
-        download_btn = WebDriverWait(driver, 20).until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, "button.widget-actions-item.export[title='CSV']"))
-        )
-        driver.execute_script("arguments[0].click();", download_btn)
-        print(" Download initiated.")
-    except Exception as e:
-        print(f"[ERROR] Download button error: {e}")
+# Chrome is started on the first cache miss only
+driver = None
+cache = DownloadCache(config.paths.cache_dir)
 
 # ========== LOAD KEYWORDS ==========
-if not os.path.exists(CSV_FILE):
-    print(f"[ERROR] CSV file not found: {CSV_FILE}")
-    driver.quit()
-    sys.exit(1)
-
-data_by_geo = {}
-with open(CSV_FILE, newline='', encoding='utf-8') as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        geo = row['geo']
-        if geo not in data_by_geo:
-            data_by_geo[geo] = []
-        data_by_geo[geo].append(row['google_trends_keywords'])
+data_by_geo = {geo: [k.topic_id for k in group] for geo, group in config.by_geo().items()}
 
 # ========== PROCESS EACH GEO ==========
 for geo, topic_codes in data_by_geo.items():
@@ -80,33 +38,42 @@ for geo, topic_codes in data_by_geo.items():
 
     q_param = ",".join(quote_plus(code.strip()) for code in topic_codes)
     date_param = f"{start_date} {end_date}"
-    url = f"https://trends.google.com/trends/explore?date={date_param}&geo={geo}&gprop=youtube&q={q_param}&hl=en"
+    url = f"https://trends.google.com/trends/explore?date={date_param}&geo={geo}&gprop={config.gprop}&q={q_param}&hl=en"
+    new_path = config.paths.incremental_file(geo, start_date, end_date)
+    new_name = os.path.basename(new_path)
+    query = make_query(geo, topic_codes, start_date, end_date, gprop=config.gprop)
 
     print(f"\n Fetching daily trends for geo '{geo}' from {start_date} to {end_date}")
+    # A cached response covering this range (e.g. fetched earlier today from an earlier start) is sliced and reused;
+    # incremental data is re-anchored against the history downstream, so its own normalization does not matter
+    if restore(cache, query, new_path, allow_superset=True):
+        print(f" Restored from cache: {new_name}")
+        continue
+
     print("Link: ", url)
+    if driver is None:
+        driver = start_driver(OUTPUT_DIR, config.chrome_profile)
     driver.get(url)
     time.sleep(5)
 
     # CAPTCHA check
-    if "robot" in driver.page_source.lower() or "captcha" in driver.page_source.lower():
-        print(" CAPTCHA triggered. Please solve manually...")
-        input(" Press Enter after solving CAPTCHA...")
+    captcha_check(driver)
 
     # Download
     click_download_button(driver)
-    downloaded_file = os.path.join(OUTPUT_DIR, "multiTimeline.csv")
-    new_name = f"geo_{geo}_{start_date}_to_{end_date}_compare.csv"
-    new_path = os.path.join(OUTPUT_DIR, new_name)
+    downloaded_file = os.path.join(OUTPUT_DIR, DOWNLOAD_NAME)
 
     if wait_for_download(downloaded_file):
         if os.path.exists(new_path):
             os.remove(new_path)
         os.rename(downloaded_file, new_path)
+        store(cache, query, new_path)
         print(f" Saved: {new_name}")
     else:
         print(f"[ERROR] Download failed or timed out for geo: {geo}")
 
     time.sleep(WAIT_TIME)
 
-driver.quit()
+if driver is not None:
+    driver.quit()
 print("Done scraping all geos.")
@@ -0,0 +1,147 @@
+import os
+import re
+import sys
+import numpy as np
+from trends_config import load_registry
+from aggregate_cube import cube_path, update_cube
+from trends_csv import parse_trends_csv
+from trends_store import PartitionedStore
+
+# === CONFIGURATION ===
+config = load_registry()
+INCREMENTAL_DIR = config.paths.incremental_dir
+OVERLAP_DAYS = 30  # fetches start this many days before the watermark so new files can be aligned to the store
+
+# Match pattern like: geo_IN_2025-07-01_to_2025-07-11_compare.csv
+file_pattern = re.compile(r"^geo_(.+?)_(\d{4}-\d{2}-\d{2})_to_(\d{4}-\d{2}-\d{2})_compare\.csv$")
+
+
+# === WATERMARK ===
+def read_watermark(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        value = f.read().strip()
+    return np.datetime64(value, "D") if value else None
+
+
+def write_watermark(path, day):
+    # Written next to the target and renamed over it, so readers never see a half-written date
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(day))
+    os.replace(tmp_path, path)
+
+
+# === INPUT FILES ===
+def incremental_files(folder=INCREMENTAL_DIR):
+    # {geo: [(start, end, path), ...]} ordered by end date, then start date (widest overlap first)
+    grouped = {}
+    if not os.path.isdir(folder):
+        return grouped
+    for name in os.listdir(folder):
+        match = file_pattern.match(name)
+        if match:
+            geo, start, end = match.groups()
+            grouped.setdefault(geo, []).append((np.datetime64(start), np.datetime64(end), os.path.join(folder, name)))
+    for files in grouped.values():
+        files.sort(key=lambda f: (f[1], f[0]))
+    return grouped
+
+
+# === ALIGNMENT ===
+def scale_factors(store, table):
+    # Same rule as calculate_incremental_scaling.py: median of stored / new over overlapping days where both are > 0.
+    # Only the store partitions covering the file's own date range are read. A column without valid overlap gets NaN:
+    # its new values cannot be put on the store's scale, and 1.0 would append them unscaled.
+    old = store.read_table(usecols=table.columns, dtype=np.float64, start=table.dates.min(), end=table.dates.max())
+    _, new_idx, old_idx = np.intersect1d(table.dates, old.dates, return_indices=True)
+    old_positions = {col: j for j, col in enumerate(old.columns)}
+
+    factors = np.ones(len(table.columns))
+    for j, col in enumerate(table.columns):
+        if col not in old_positions:
+            print(f"⚠️ '{col}' is not in the store — it will not be appended")
+            continue
+        new_vals = table.values[new_idx, j]
+        old_vals = old.values[old_idx, old_positions[col]]
+        mask = (new_vals > 0) & (old_vals > 0)
+        if not mask.any():
+            print(f"❌ No valid overlap for '{col}'")
+            factors[j] = np.nan
+            continue
+        factors[j] = np.median(old_vals[mask] / new_vals[mask])
+        print(f"📏 Scaling factor for '{col}': {factors[j]:.3f} ({mask.sum()} overlapping days)")
+    return factors
+
+
+# === INGEST ===
+def seed_store(store, source):
+    # One-time copy of the full scaled history into yearly partitions
+    table = parse_trends_csv(source, dtype=np.float64)
+    added = store.append(table.dates, table.columns, table.values)
+    print(f"🌱 Seeded {store.folder} with {added} days from {source}")
+
+
+def ingest_geo(geo, files, seed=None):
+    store = PartitionedStore(config.store_folder(geo))
+    watermark_path = config.watermark_file(geo)
+    if seed and not store.exists() and os.path.exists(seed):
+        seed_store(store, seed)
+
+    # The store itself is the source of truth: if a previous run appended rows but stopped before moving the
+    # watermark, the watermark catches up here instead of those days being appended twice
+    watermark = read_watermark(watermark_path)
+    last = store.last_date()
+    if last is not None and (watermark is None or last > watermark):
+        watermark = last
+        write_watermark(watermark_path, watermark)
+
+    added = 0
+    for start, end, path in files:
+        if watermark is not None and end <= watermark:
+            continue  # nothing new in this file; it is not even opened
+        table = parse_trends_csv(path, dtype=np.float64)
+        if table.date_label != "Day" or not len(table.dates):
+            print(f"⚠️ Skipping file (no daily rows): {path}")
+            continue
+        factors = scale_factors(store, table) if store.exists() else np.ones(len(table.columns))
+        if np.isnan(factors).any():
+            # Nothing is appended and the watermark stays put, so the days are retried once a file overlaps the store
+            print(f"❌ Skipping file (no valid overlap with {store.folder}): {path}")
+            continue
+
+        new = table.dates > watermark if watermark is not None else np.ones(len(table.dates), dtype=bool)
+        n_rows = store.append(table.dates[new], table.columns, table.values[new] * factors)
+        if n_rows:
+            watermark = table.dates[new].max()
+            write_watermark(watermark_path, watermark)
+            added += n_rows
+        print(f"📥 {os.path.basename(path)}: appended {n_rows} days (watermark {watermark})")
+
+    # The dashboard's and API's cube for this store takes just the appended days
+    if store.exists():
+        cube, cube_days = update_cube(store.folder, cube_path(geo, "daily_scaled"), geo)
+        print(f"🧊 Cube {cube_path(geo, 'daily_scaled')}: {cube_days} new days ({len(cube)} total)")
+    return added, watermark
+
+
+def ingest(folder=INCREMENTAL_DIR, geos=None):
+    results = {}
+    for geo, files in incremental_files(folder).items():
+        if geos and geo not in geos:
+            continue
+        # The primary geo's store starts from the existing scaled history; other geos start from their first file
+        seed = config.daily_scaled_file if geo == config.primary_geo else None
+        results[geo] = ingest_geo(geo, files, seed)
+    return results
+
+
+if __name__ == "__main__":
+    # Usage: python ingest_incremental.py [GEO ...]
+    results = ingest(geos=sys.argv[1:])
+    if not results:
+        print(f"🚫 No incremental files found in {INCREMENTAL_DIR}")
+    for geo, (added, watermark) in results.items():
+        print(f"✅ {geo}: {added} new days, last processed date {watermark}")
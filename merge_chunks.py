@@ -1,72 +1,148 @@
+import csv
 import os
-import pandas as pd
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from glob import glob
+import numpy as np
+from trends_config import load_registry
+from trends_csv import TrendsReader, parse_trends_csv
 
-INPUT_FOLDER = "downloads_daily_chunks"  # <-- Use your folder from download
-OUTPUT_FOLDER = "merged"
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+config = load_registry()
+INPUT_FOLDER = config.paths.daily_chunks_dir
+OUTPUT_FOLDER = config.paths.merged_dir
+MAX_WORKERS = os.cpu_count() or 1
 
 # Match pattern like: 5keywords_2020-07-01_to_2021-01-01.csv
 file_pattern = re.compile(r"^(.*?)_\d{4}-\d{2}-\d{2}_to_\d{4}-\d{2}-\d{2}\.csv$")
 
-grouped_files = {}
 
-# Group files by prefix (e.g., '5keywords')
-for file in glob(os.path.join(INPUT_FOLDER, "*.csv")):
-    base = os.path.basename(file)
-    match = file_pattern.match(base)
-    if match:
-        group_key = match.group(1)
-        grouped_files.setdefault(group_key, []).append(file)
+def group_files(folder=INPUT_FOLDER):
+    # Group files by prefix (e.g., '5keywords')
+    grouped_files = {}
+    for file in glob(os.path.join(folder, "*.csv")):
+        match = file_pattern.match(os.path.basename(file))
+        if match:
+            grouped_files.setdefault(match.group(1), []).append(file)
+    return {group: sorted(files) for group, files in grouped_files.items()}
 
-# Merge for each group
-for group, files in grouped_files.items():
-    print(f"\n🔄 Merging {len(files)} files for group: {group}")
-    dfs = []
-    headers = set()
-
-    for file in sorted(files):
-        with open(file, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-
-        # Find header row (starts with 'Day')
-        header_index = 0
-        for idx, line in enumerate(lines):
-            if line.lower().startswith("day"):
-                header_index = idx
-                break
-
-        df = pd.read_csv(file, skiprows=header_index)
-        if "Day" not in df.columns:
+
+def chunk_table(path):
+    # One whole chunk through the vectorized parser; Trends exports are in date order
+    table = parse_trends_csv(path, dtype=np.float64)
+    if (np.diff(table.dates) < np.timedelta64(0, "D")).any():
+        raise ValueError(f"{path} is not sorted by day")
+    return table
+
+
+def accumulate(days, sums, counts, table, positions):
+    # Adds one chunk into per-day sums and counts of non-missing values (days sorted, one row each) with np.add.at;
+    # positions are the output columns of the chunk's columns. Returns the grown (days, sums, counts).
+    merged_days = np.union1d(days, table.dates.astype("datetime64[D]"))
+    merged_sums = np.zeros((len(merged_days), sums.shape[1]))
+    merged_counts = np.zeros((len(merged_days), sums.shape[1]))
+    carried = np.searchsorted(merged_days, days)
+    merged_sums[carried] = sums
+    merged_counts[carried] = counts
+    cells = (np.searchsorted(merged_days, table.dates.astype("datetime64[D]"))[:, None], positions[None, :])
+    present = ~np.isnan(table.values)
+    np.add.at(merged_sums, cells, np.where(present, table.values, 0.0))
+    np.add.at(merged_counts, cells, present)
+    return merged_days, merged_sums, merged_counts
+
+
+def merge_stream(files):
+    # Returns (columns, blocks) where blocks yields (days, per-keyword means) in day order, or None without valid
+    # files. Headers and first days only up front: the output columns are the union of keyword columns, in
+    # first-seen order.
+    columns = []
+    chunks = []
+    for i, file in enumerate(files):
+        try:
+            with TrendsReader(file) as reader:
+                date_label, chunk_columns = reader.date_label, reader.columns
+                first = next(reader.raw_rows(), (None,))[0]
+        except ValueError:
+            date_label, chunk_columns, first = None, [], None
+        if date_label != "Day":
             print(f"⚠️ Skipping file (no 'Day'): {file}")
             continue
+        columns.extend(col for col in chunk_columns if col not in columns)
+        if first is not None:
+            chunks.append((np.datetime64(first, "D"), i, file, chunk_columns))
+
+    if not columns:
+        return None
+
+    if len({tuple(chunk_columns) for _, _, _, chunk_columns in chunks}) > 1:
+        print(f"⚠️ Column mismatch detected. Aligning {len(columns)} keywords by name.")
+
+    def blocks():
+        # One chunk in memory at a time, in order of first day. Its rows are added into running per-day sums and
+        # counts; days before the next chunk's first day can no longer change and are handed on.
+        # Days covered by several chunks get the mean of the chunks that have a value (same as groupby("Day").mean()).
+        index = {col: i for i, col in enumerate(columns)}
+        chunks.sort(key=lambda chunk: chunk[:2])
+        days = np.array([], dtype="datetime64[D]")
+        sums = np.zeros((0, len(columns)))
+        counts = np.zeros((0, len(columns)))
+        for n, (_, _, file, _) in enumerate(chunks):
+            table = chunk_table(file)
+            positions = np.array([index[col] for col in table.columns], dtype=int)
+            merged_days, merged_sums, merged_counts = accumulate(days, sums, counts, table, positions)
+
+            done = len(merged_days) if n == len(chunks) - 1 else np.searchsorted(merged_days, chunks[n + 1][0])
+            if done:
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    yield merged_days[:done], merged_sums[:done] / merged_counts[:done]
+            days, sums, counts = merged_days[done:], merged_sums[done:], merged_counts[done:]
 
-        headers.add(tuple(df.columns))
-        dfs.append(df)
+    return columns, blocks()
 
-    if not dfs:
+
+def format_block(days, values):
+    # CSV text for a block of merged rows, as csv.writer would write them: repr() floats, blank cells for missing
+    # values (v != v only for NaN), "\r\n" line endings
+    lines = [",".join([day] + ["" if v != v else repr(v) for v in row]) + "\r\n"
+             for day, row in zip(np.asarray(days, dtype="datetime64[D]").astype(str), values.tolist())]
+    return "".join(lines)
+
+
+def merge_group(group, files, output_folder=OUTPUT_FOLDER):
+    print(f"\n🔄 Merging {len(files)} files for group: {group}")
+    merged = merge_stream(files)
+    if merged is None:
         print(f"🚫 No valid CSVs found for group: {group}")
-        continue
-
-    # Merge logic
-    if len(headers) > 1:
-        print(f"⚠️ Column mismatch detected. Applying outer merge with renaming.")
-        renamed_dfs = []
-        for i, df in enumerate(dfs):
-            df.columns = [col if col == "Day" else f"{col}_({i+1})" for col in df.columns]
-            renamed_dfs.append(df)
-        merged = renamed_dfs[0]
-        for df in renamed_dfs[1:]:
-            merged = pd.merge(merged, df, on="Day", how="outer")
-    else:
-        merged = pd.concat(dfs, ignore_index=True)
-        merged = merged.groupby("Day", as_index=False).mean(numeric_only=True)
-
-    # Final formatting
-    merged.sort_values("Day", inplace=True)
-    merged.reset_index(drop=True, inplace=True)
-
-    output_file = os.path.join(OUTPUT_FOLDER, f"{group}_combined_daily.csv")
-    merged.to_csv(output_file, index=False)
-    print(f"✅ Saved merged file: {output_file}")
+        return None
+    columns, blocks = merged
+
+    os.makedirs(output_folder, exist_ok=True)
+    output_file = os.path.join(output_folder, f"{group}_combined_daily.csv")
+    tmp_path = output_file + ".tmp"
+    n_days = 0
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerow(["Day"] + columns)
+        for days, values in blocks:
+            f.write(format_block(days, values))
+            n_days += len(days)
+    os.replace(tmp_path, output_file)
+
+    print(f"✅ Saved merged file: {output_file} ({n_days} days, {len(columns)} keywords)")
+    return output_file
+
+
+def run(grouped_files, output_folder=OUTPUT_FOLDER, max_workers=MAX_WORKERS):
+    # Groups are independent, so they are merged across processes
+    groups = list(grouped_files.items())
+    if len(groups) > 1 and max_workers > 1:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(groups))) as pool:
+            futures = [pool.submit(merge_group, group, files, output_folder) for group, files in groups]
+            return [future.result() for future in futures]
+    return [merge_group(group, files, output_folder) for group, files in groups]
+
+
+if __name__ == "__main__":
+    # Usage: python merge_chunks.py [input_folder [output_folder]]
+    input_folder = sys.argv[1] if len(sys.argv) > 1 else INPUT_FOLDER
+    output_folder = sys.argv[2] if len(sys.argv) > 2 else OUTPUT_FOLDER
+    run(group_files(input_folder), output_folder)
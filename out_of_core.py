@@ -0,0 +1,157 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from aggregate_cube import WindowAccumulator, auc_bounds, auc_table
+from google_trends_5y_daily_rescaled import assign_chunks, chunk_edges, rescale
+from merge_chunks import group_files, merge_stream
+from trends_config import load_registry
+from trends_csv import TrendsTable, parse_trends_csv, read_trends_frame, to_frame
+from trends_store import PartitionWriter, PartitionedStore, partition_file
+
+# Out-of-core merge -> rescale -> AUC, one geo per process and one year (or one rescale chunk) in memory at a time.
+# Every stage reads and writes yearly partitions: store/<group>_<stage>/geo=<GEO>/<year>.csv
+#   merge:   daily chunk files -> <group>_daily            (chunk-at-a-time merge from merge_chunks.py)
+#   rescale: <group>_daily     -> <group>_daily_scaled     (one 6-month chunk at a time through the same rescale())
+#   auc:     <group>_daily_scaled + weekly file -> <group>_auc/geo=<GEO>/auc_<window>.csv
+# Per-chunk means are computed over exactly the rows the in-memory groupby sees, and the AUC accumulator continues
+# the cube's running sums across partitions, so the outputs are identical to the in-memory scripts.
+
+# === CONFIGURATION ===
+config = load_registry()
+MAX_WORKERS = os.cpu_count() or 1
+STAGES = ("merge", "rescale", "auc")
+
+
+def dataset_folder(stage, geo):
+    return config.paths.store_folder(f"{config.group_name}_{stage}", geo)
+
+
+def chunk_group(geo):
+    # Daily chunk file prefix for a geo (same naming as fetch_orchestrator.chunk_jobs)
+    return config.group_name if geo == config.primary_geo else f"{config.group_name}_{geo}"
+
+
+# === MERGE ===
+def merge_geo(geo, input_folder=None):
+    files = group_files(input_folder or config.paths.daily_chunks_dir).get(chunk_group(geo), [])
+    output_folder = dataset_folder("daily", geo)
+    merged = merge_stream(files)
+    if merged is None:
+        # Nothing to merge: fall back to the existing merged file for the primary geo
+        if geo == config.primary_geo and os.path.exists(config.daily_file):
+            rows = partition_file(config.daily_file, output_folder)
+            print(f"📂 {geo}: no chunk files, partitioned {config.daily_file} ({rows} days)")
+            return output_folder
+        print(f"🚫 {geo}: no daily chunks for group {chunk_group(geo)}")
+        return None
+    columns, blocks = merged
+    writer = PartitionWriter(output_folder, columns)
+    for days, values in blocks:
+        writer.write_values(days, values)
+    writer.close()
+    print(f"✅ {geo}: merged {writer.rows} days into {output_folder}")
+    return output_folder
+
+
+# === RESCALE ===
+def rescale_geo(geo, weekly_file=None, daily_folder=None, output_folder=None):
+    store = PartitionedStore(daily_folder or dataset_folder("daily", geo))
+    if not store.exists():
+        print(f"🚫 {geo}: run the merge stage first ({store.folder} is empty)")
+        return None
+    # The weekly export has one row per week, so it is read whole
+    weekly_df = read_trends_frame(weekly_file or config.paths.weekly_file(geo), less_than_one=np.nan, dtype=np.float64)
+    edges = chunk_edges(pd.Timestamp(store.first_date()), pd.Timestamp(store.last_date()))
+    weekly_chunks = assign_chunks(weekly_df["Week"].to_numpy().astype("datetime64[D]"), edges)
+
+    output_folder = output_folder or dataset_folder("daily_scaled", geo)
+    columns = store.columns
+    writer = PartitionWriter(output_folder, columns)
+    reports = []
+    # Each yearly partition is parsed once. The chunks it completes are rescaled together, against just their own
+    # weeks; rows of a chunk that continues into the next year are carried over.
+    days = np.array([], dtype="datetime64[D]")
+    values = np.empty((0, len(columns)))
+    chunk = 0
+    partitions = store.partitions()
+    for n, (_, path) in enumerate(partitions):
+        table = parse_trends_csv(path, dtype=np.float64)
+        days = np.concatenate([days, table.dates])
+        values = np.vstack([values, table.values])
+        # Every day before the next partition's year has been read, so the chunks ending by then are complete
+        read_until = edges[-1] if n == len(partitions) - 1 else np.datetime64(f"{partitions[n + 1][0]}-01-01", "D")
+        last = np.searchsorted(edges, read_until, side="right") - 1
+        if last <= chunk:
+            continue
+        k = np.searchsorted(days, edges[last])
+        rows = TrendsTable(store.folder, "Day", days[:k], columns, values[:k], [])
+        weeks = weekly_df[(weekly_chunks >= chunk) & (weekly_chunks < last)]
+        final_df, report = rescale(to_frame(rows, date_column="Day"), weeks, edges[chunk:last + 1])
+        writer.write_values(final_df["Day"].to_numpy(), final_df.iloc[:, 1:].to_numpy())
+        reports.append(report)
+        days, values = days[k:], values[k:]
+        chunk = last
+    writer.close()
+    if reports:
+        pd.concat(reports, ignore_index=True).to_csv(os.path.join(output_folder, "scale_factors.csv"), index=False)
+    print(f"✅ {geo}: rescaled {writer.rows} days in {len(edges) - 1} chunks into {output_folder}")
+    return output_folder
+
+
+# === AUC ===
+def auc_geo(geo, window="6month", weekly_file=None, daily_folder=None, output_folder=None):
+    store = PartitionedStore(daily_folder or dataset_folder("daily_scaled", geo))
+    if not store.exists():
+        print(f"🚫 {geo}: run the rescale stage first ({store.folder} is empty)")
+        return None
+    weekly = parse_trends_csv(weekly_file or config.paths.weekly_file(geo), dtype=np.float64)
+    bounds = auc_bounds(weekly.dates, window)
+
+    weekly_acc = WindowAccumulator(weekly.columns, bounds)
+    weekly_acc.feed(weekly.dates, weekly.values)
+    daily_acc = WindowAccumulator(store.columns, bounds)
+    for year, path in store.partitions():
+        table = parse_trends_csv(path, dtype=np.float64)
+        daily_acc.feed(table.dates, table.values)
+
+    table = auc_table(weekly_acc.frame(), daily_acc.frame())
+
+    output_folder = output_folder or config.paths.store_folder(f"{config.group_name}_auc", geo)
+    os.makedirs(output_folder, exist_ok=True)
+    output_file = os.path.join(output_folder, f"auc_{window}.csv")
+    table.to_csv(output_file, index=False)
+    print(f"✅ {geo}: {len(table)} AUC rows ({window}) in {output_file}")
+    return output_file
+
+
+# === RUN ===
+def run_geo(geo, stages=STAGES):
+    results = {}
+    if "merge" in stages:
+        results["merge"] = merge_geo(geo)
+    if "rescale" in stages:
+        results["rescale"] = rescale_geo(geo)
+    if "auc" in stages:
+        results["auc"] = auc_geo(geo)
+    return geo, results
+
+
+def run(geos, stages=STAGES, max_workers=MAX_WORKERS):
+    # Geos are independent partitions, so they run in parallel processes
+    if len(geos) > 1 and max_workers > 1:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(geos))) as pool:
+            return list(pool.map(run_geo, geos, [stages] * len(geos)))
+    return [run_geo(geo, stages) for geo in geos]
+
+
+if __name__ == "__main__":
+    # Usage: python out_of_core.py [merge|rescale|auc|all] [GEO ...]
+    args = sys.argv[1:]
+    stage = args.pop(0) if args and args[0] in STAGES + ("all",) else "all"
+    stages = STAGES if stage == "all" else (stage,)
+    geos = args or config.geos
+    for geo, results in run(geos, stages):
+        for name, output in results.items():
+            print(f"📦 {geo} {name}: {output or 'skipped'}")
@@ -0,0 +1,540 @@
+import contextlib
+import datetime
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from aggregate_cube import TrendsCube, auc_bounds, auc_table, month_windows
+from fake_trends_server import render_csv
+from google_trends_5y_daily_rescaled import chunk_edges, rescale
+from merge_chunks import group_files, merge_group
+from out_of_core import auc_geo, rescale_geo
+from rescale_chunks_fixed_reference import fixed_reference_scale
+from trends_config import load_registry
+from trends_csv import parse_many, parse_trends_csv, read_trends_columns, read_trends_frame
+from trends_store import partition_file, read_frame
+
+# Regression harness for the merge -> rescale -> fixed-reference -> AUC pipeline. No test suite exists, so this is
+# the gate for performance work: a faster engine is adopted only if it reproduces the numbers below.
+#   freeze: run the current code on the real inputs (merged/, downloads_compare/, downloads_daily_chunks/) and on
+#           deterministic synthetic inputs, and save every stage's output under golden/ with a manifest
+#   check:  rerun the current code and compare each stage with its golden file (exit code 1 on drift)
+#   diff:   run the legacy implementations (the original scripts, kept below as functions) and the current ones side
+#           by side on real and synthetic inputs; prints max error, pass/fail and speedup per stage
+# Legacy-vs-current pairs compare like with like: the rescale pair uses the legacy 180-day chunks on both sides and
+# the AUC pair the legacy 6-month steps from the first weekly date (production now uses calendar half-years,
+# Jan 1 / Jul 1, which golden/ freezes), and the merge pair only runs on chunk sets with matching headers (legacy
+# renamed mismatched columns to "<kw>_(i)" instead of aligning them).
+
+# === CONFIGURATION ===
+config = load_registry()
+GOLDEN_DIR = "golden"
+MANIFEST_FILE = os.path.join(GOLDEN_DIR, "manifest.json")
+REPEAT = 3  # timings are the best of this many runs
+SYNTHETIC_GEO = "IN"
+SYNTHETIC_END = datetime.date(2025, 6, 30)  # fixed, so synthetic inputs never depend on today's date
+SYNTHETIC_KEYWORDS = 5
+SYNTHETIC_YEARS = 3
+LEGACY_CHUNK_DAYS = 180  # 30 * step_months in the original rescale script
+
+# (rtol, atol) per comparison. Golden files are written with exact float repr, so only formatting noise is allowed;
+# legacy-vs-current pairs may differ by summation order in the chunk means and the trapezoid sums.
+GOLDEN_TOLERANCE = (1e-12, 1e-9)
+DIFF_TOLERANCE = {
+    "merge": (1e-12, 1e-9),
+    "rescale": (1e-9, 1e-9),
+    "fixed_reference": (1e-12, 1e-9),
+    "auc": (1e-9, 1e-6),
+    "rescale_out_of_core": (0.0, 0.0),
+    "auc_out_of_core": (0.0, 0.0),
+}
+KEYS = {"merge": ["Day"], "rescale": ["Day"], "fixed_reference": ["Date"], "auc": ["Keyword", "Start", "End"]}
+
+
+# === LEGACY IMPLEMENTATIONS ===
+# Same logic as the original scripts, minus the file writes and prints
+def legacy_merge(case, workdir):
+    dfs = []
+    headers = set()
+    for file in sorted(case["chunks"]):
+        with open(file, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+        header_index = 0
+        for idx, line in enumerate(lines):
+            if line.lower().startswith("day"):
+                header_index = idx
+                break
+        df = pd.read_csv(file, skiprows=header_index)
+        if "Day" not in df.columns:
+            continue
+        headers.add(tuple(df.columns))
+        dfs.append(df)
+
+    if len(headers) > 1:
+        renamed_dfs = []
+        for i, df in enumerate(dfs):
+            df.columns = [col if col == "Day" else f"{col}_({i+1})" for col in df.columns]
+            renamed_dfs.append(df)
+        merged = renamed_dfs[0]
+        for df in renamed_dfs[1:]:
+            merged = pd.merge(merged, df, on="Day", how="outer")
+    else:
+        merged = pd.concat(dfs, ignore_index=True)
+        merged = merged.groupby("Day", as_index=False).mean(numeric_only=True)
+    merged.sort_values("Day", inplace=True)
+    merged.reset_index(drop=True, inplace=True)
+    # Written and read back like the current merge, so both timings include the output file
+    output_file = os.path.join(workdir, f"{case['group']}_legacy_daily.csv")
+    merged.to_csv(output_file, index=False)
+    return pd.read_csv(output_file, float_precision="round_trip")
+
+
+def legacy_rescale(case, workdir):
+    daily_df = pd.read_csv(case["daily"])
+    daily_df["Day"] = pd.to_datetime(daily_df["Day"])
+    weekly_df = pd.read_csv(case["weekly"], skiprows=2)
+    weekly_df["Week"] = pd.to_datetime(weekly_df["Week"])
+    data_columns = [col for col in daily_df.columns if col != "Day"]
+
+    end_date = daily_df["Day"].max()
+    current = daily_df["Day"].min()
+    scaled_chunks = []
+    while current < end_date:
+        next_date = current + datetime.timedelta(days=LEGACY_CHUNK_DAYS)
+        chunk_end = min(next_date, end_date)
+        daily_chunk = daily_df[(daily_df["Day"] >= current) & (daily_df["Day"] < chunk_end)].copy()
+        weekly_chunk = weekly_df[(weekly_df["Week"] >= current) & (weekly_df["Week"] < chunk_end)].copy()
+        if daily_chunk.empty or weekly_chunk.empty:
+            current = next_date
+            continue
+        for col in data_columns:
+            daily_chunk[col] = pd.to_numeric(daily_chunk[col], errors="coerce")
+            weekly_chunk[col] = pd.to_numeric(weekly_chunk[col], errors="coerce")
+            daily_avg = daily_chunk[col].mean()
+            weekly_avg = weekly_chunk[col].mean()
+            scale_factor = 1 if pd.isna(daily_avg) or daily_avg == 0 else weekly_avg / daily_avg
+            daily_chunk[col] = daily_chunk[col] * scale_factor
+        scaled_chunks.append(daily_chunk)
+        current = next_date
+
+    final_df = pd.concat(scaled_chunks)
+    final_df.sort_values("Day", inplace=True)
+    final_df.reset_index(drop=True, inplace=True)
+    return final_df
+
+
+def legacy_fixed_reference(case, workdir):
+    reference = case["reference"]
+    rescaled_chunks = []
+    for file in sorted(case["chunks"]):
+        df = pd.read_csv(file, skiprows=2)
+        df.rename(columns={"Day": "Date"}, inplace=True)
+        df["Date"] = pd.to_datetime(df["Date"])
+        df_scaled = df.copy()
+        ref_col = pd.to_numeric(df[reference], errors="coerce").fillna(0)
+        for col in df.columns:
+            if col != "Date" and col != reference:
+                other_col = pd.to_numeric(df[col], errors="coerce").fillna(0)
+                df_scaled[col] = (other_col / ref_col.replace(0, pd.NA)) * 100
+                df_scaled[col] = df_scaled[col].fillna(0)
+        df_scaled[reference] = ref_col
+        rescaled_chunks.append(df_scaled)
+    return pd.concat(rescaled_chunks).sort_values("Date")
+
+
+def legacy_auc(case, workdir):
+    # The dashboard's original 6-month AUC loop, unrounded
+    trapz = getattr(np, "trapezoid", None) or np.trapz
+    weekly_df = pd.read_csv(case["weekly"], skiprows=2).rename(columns={"Week": "Date"})
+    daily_df = pd.read_csv(case["daily_scaled"]).rename(columns={"Day": "Date"})
+    # Pinned to nanoseconds: the script was written for pandas < 3, where astype(np.int64) / 1e9 gives seconds
+    weekly_df["Date"] = pd.to_datetime(weekly_df["Date"]).astype("datetime64[ns]")
+    daily_df["Date"] = pd.to_datetime(daily_df["Date"]).astype("datetime64[ns]")
+    keywords = [col for col in weekly_df.columns if col != "Date" and col in daily_df.columns]
+
+    start_date = weekly_df["Date"].min().normalize()
+    end_date = weekly_df["Date"].max().normalize()
+    chunks = []
+    while start_date < end_date:
+        next_date = start_date + pd.DateOffset(months=6)
+        chunks.append((start_date, min(next_date, end_date)))
+        start_date = next_date
+
+    rows = []
+    for kw in keywords:
+        for start, end in chunks:
+            w_chunk = weekly_df[(weekly_df["Date"] >= start) & (weekly_df["Date"] < end)].dropna()
+            d_chunk = daily_df[(daily_df["Date"] >= start) & (daily_df["Date"] < end)].dropna()
+            w_values = pd.to_numeric(w_chunk[kw], errors="coerce").fillna(0)
+            d_values = pd.to_numeric(d_chunk[kw], errors="coerce").fillna(0)
+            if len(w_values) < 2 or len(d_values) < 2:
+                continue
+            w_auc = trapz(w_values, x=w_chunk["Date"].astype(np.int64) / 1e9)
+            d_auc = trapz(d_values, x=d_chunk["Date"].astype(np.int64) / 1e9)
+            rows.append({"Keyword": kw, "Start": start.date(), "End": end.date(), "Weekly AUC": w_auc,
+                         "Daily AUC": d_auc, "AUC Ratio": d_auc / w_auc if w_auc else np.nan})
+    return pd.DataFrame(rows)
+
+
+# === CURRENT IMPLEMENTATIONS ===
+def current_merge(case, workdir):
+    output_file = merge_group(case["group"], case["chunks"], workdir)
+    return pd.read_csv(output_file, float_precision="round_trip")
+
+
+def _rescale_frames(case, legacy_chunks=False):
+    daily_df = read_trends_frame(case["daily"], dtype=np.float64)
+    weekly_df = read_trends_frame(case["weekly"], less_than_one=np.nan, dtype=np.float64)
+    if legacy_chunks:
+        # Same chunks as the legacy loop: 180-day steps, the last day itself is left out
+        start, end = np.datetime64(daily_df["Day"].min(), "D"), np.datetime64(daily_df["Day"].max(), "D")
+        edges = np.append(np.arange(start, end, LEGACY_CHUNK_DAYS), end)
+    else:
+        edges = chunk_edges(daily_df["Day"].min(), daily_df["Day"].max())
+    return rescale(daily_df, weekly_df, edges)[0]
+
+
+def current_rescale(case, workdir):
+    return _rescale_frames(case)
+
+
+def current_rescale_legacy_chunks(case, workdir):
+    return _rescale_frames(case, legacy_chunks=True)
+
+
+def current_fixed_reference(case, workdir):
+    return fixed_reference_scale(parse_many(case["chunks"], dtype=np.float64), case["reference"])[0]
+
+
+def _auc_frame(case, legacy_windows=False):
+    # The dashboard's cube path (aggregate_cube.auc_table) without the display rounding
+    weekly = parse_trends_csv(case["weekly"], dtype=np.float64)
+    daily = parse_trends_csv(case["daily_scaled"], dtype=np.float64)
+    if legacy_windows:
+        # Same windows as the legacy loop: 6-month steps from the first weekly date
+        bounds = month_windows(pd.Timestamp(weekly.dates[0]), pd.Timestamp(weekly.dates[-1]), 6)
+    else:
+        bounds = auc_bounds(weekly.dates)
+    weekly_cube = TrendsCube(config.primary_geo, weekly.columns, weekly.dates, weekly.values)
+    daily_cube = TrendsCube(config.primary_geo, daily.columns, daily.dates, daily.values)
+    return auc_table(weekly_cube.window_frame(bounds), daily_cube.window_frame(bounds))
+
+
+def current_auc(case, workdir):
+    return _auc_frame(case)
+
+
+def current_auc_legacy_windows(case, workdir):
+    return _auc_frame(case, legacy_windows=True)
+
+
+def out_of_core_rescale(case, workdir):
+    output_folder = rescale_geo(config.primary_geo, case["weekly"], case["daily_store"], os.path.join(workdir, "rescaled"))
+    return read_frame(output_folder, date_column="Day", dtype=np.float64)
+
+
+def out_of_core_auc(case, workdir):
+    output_file = auc_geo(config.primary_geo, "6month", case["weekly"], case["scaled_store"], os.path.join(workdir, "auc"))
+    return pd.read_csv(output_file, float_precision="round_trip")
+
+
+# Stage -> (inputs it needs, current implementation); the order is the pipeline order
+GOLDEN_STAGES = {
+    "merge": (("chunks",), current_merge),
+    "rescale": (("daily", "weekly"), current_rescale),
+    "fixed_reference": (("chunks", "reference"), current_fixed_reference),
+    "auc": (("weekly", "daily_scaled"), current_auc),
+}
+
+# (name, key stage, inputs, baseline label, baseline, candidate label, candidate)
+DIFF_PAIRS = [
+    ("merge", "merge", ("chunks",), "legacy", legacy_merge, "chunked", current_merge),
+    ("rescale", "rescale", ("daily", "weekly"), "legacy", legacy_rescale, "vectorized", current_rescale_legacy_chunks),
+    ("fixed_reference", "fixed_reference", ("chunks", "reference"), "legacy", legacy_fixed_reference,
+     "parse_many", current_fixed_reference),
+    ("auc", "auc", ("weekly", "daily_scaled"), "legacy", legacy_auc, "cube", current_auc_legacy_windows),
+    ("rescale_out_of_core", "rescale", ("daily_store", "weekly"), "in-memory", current_rescale,
+     "out-of-core", out_of_core_rescale),
+    ("auc_out_of_core", "auc", ("scaled_store", "weekly", "daily_scaled"), "in-memory", current_auc,
+     "out-of-core", out_of_core_auc),
+]
+
+
+# === INPUT CASES ===
+def real_case():
+    # The repository's own data files, as the original scripts read them
+    reference = config.reference_keyword
+    return {
+        "name": "real",
+        "group": config.group_name,
+        "chunks": group_files(config.paths.daily_chunks_dir).get(config.group_name, []),
+        "daily": config.daily_file if os.path.exists(config.daily_file) else None,
+        "weekly": config.weekly_file if os.path.exists(config.weekly_file) else None,
+        "daily_scaled": config.daily_scaled_file if os.path.exists(config.daily_scaled_file) else None,
+        "reference": reference.display_name if reference else None,
+    }
+
+
+def write_synthetic_inputs(folder, n_keywords=SYNTHETIC_KEYWORDS, years=SYNTHETIC_YEARS, end=SYNTHETIC_END):
+    # Deterministic 6-month daily chunks (overlapping on their boundary days, like the scraper's) and a weekly
+    # export over the same span, rendered by the fake Trends server
+    keywords = [f"Keyword {i + 1}" for i in range(n_keywords)]
+    start = end.replace(year=end.year - years)
+    chunk_folder = os.path.join(folder, "chunks")
+    os.makedirs(chunk_folder, exist_ok=True)
+    for window_start, window_end in month_windows(start, end, 6):
+        s, e = window_start.date(), window_end.date()
+        with open(os.path.join(chunk_folder, f"synthetic_{s}_to_{e}.csv"), "wb") as f:
+            f.write(render_csv(SYNTHETIC_GEO, keywords, f"{s} {e}"))
+    with open(os.path.join(folder, "weekly.csv"), "wb") as f:
+        f.write(render_csv(SYNTHETIC_GEO, keywords, f"{start} {end}"))
+    return f"{keywords[0]}: ({SYNTHETIC_GEO})"
+
+
+def synthetic_case(folder, reference=None):
+    # Downstream stages read the frozen (or freshly computed) upstream outputs merge.csv and rescale.csv
+    chunks = group_files(os.path.join(folder, "chunks")).get("synthetic", [])
+    if reference is None:
+        reference = read_trends_columns(chunks[0])[0] if chunks else None
+    return {
+        "name": "synthetic",
+        "group": "synthetic",
+        "chunks": chunks,
+        "daily": os.path.join(folder, "merge.csv"),
+        "weekly": os.path.join(folder, "weekly.csv"),
+        "daily_scaled": os.path.join(folder, "rescale.csv"),
+        "reference": reference,
+    }
+
+
+def has_inputs(case, needs):
+    # Chunk lists and the reference must be non-empty; file and folder inputs must exist
+    return all(case.get(key) and (key in ("chunks", "reference") or os.path.exists(case[key])) for key in needs)
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def input_hashes(case):
+    files = list(case["chunks"]) + [case[key] for key in ("daily", "weekly", "daily_scaled") if case.get(key)]
+    return {os.path.relpath(path).replace(os.sep, "/"): file_hash(path) for path in sorted(files) if os.path.exists(path)}
+
+
+# === RUNNING AND COMPARING ===
+def timed(fn, case, workdir, repeat=REPEAT):
+    # Best wall time of `repeat` runs; the stages' own progress prints are swallowed
+    best, result = None, None
+    for _ in range(max(1, repeat)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            result = fn(case, workdir)
+            elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def normalize(df, keys):
+    # Key columns as ISO strings, everything else as float64, rows in key order
+    df = df.reset_index(drop=True).copy()
+    for key in keys:
+        df[key] = pd.to_datetime(df[key]).dt.strftime("%Y-%m-%d") if key != "Keyword" else df[key].astype(str)
+    for col in df.columns:
+        if col not in keys:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(np.float64)
+    return df.sort_values(keys, kind="mergesort").reset_index(drop=True)
+
+
+def compare_frames(expected, actual, keys, rtol, atol):
+    # Returns (ok, max abs difference, note)
+    expected, actual = normalize(expected, keys), normalize(actual, keys)
+    if list(expected.columns) != list(actual.columns):
+        missing = [c for c in expected.columns if c not in actual.columns]
+        extra = [c for c in actual.columns if c not in expected.columns]
+        return False, np.nan, f"columns differ (missing {missing}, extra {extra})"
+    if len(expected) != len(actual):
+        return False, np.nan, f"{len(actual)} rows, expected {len(expected)}"
+    for key in keys:
+        bad = np.flatnonzero(expected[key].to_numpy() != actual[key].to_numpy())
+        if len(bad):
+            return False, np.nan, f"{key} differs from row {bad[0]} ({actual[key][bad[0]]} vs {expected[key][bad[0]]})"
+
+    values = [c for c in expected.columns if c not in keys]
+    e = expected[values].to_numpy(dtype=np.float64)
+    a = actual[values].to_numpy(dtype=np.float64)
+    if (np.isnan(e) != np.isnan(a)).any():
+        row, col = np.argwhere(np.isnan(e) != np.isnan(a))[0]
+        return False, np.nan, f"missing value mismatch at row {row}, '{values[col]}'"
+    both = ~np.isnan(e)
+    diff = np.abs(e - a)[both]
+    max_abs = float(diff.max()) if diff.size else 0.0
+    ok = bool(np.all(diff <= atol + rtol * np.abs(e[both])))
+    if not ok:
+        worst = np.argmax(np.where(both, np.abs(e - a) - rtol * np.abs(np.nan_to_num(e)), -np.inf))
+        row, col = np.unravel_index(worst, e.shape)
+        return False, max_abs, f"'{values[col]}' row {row}: {float(a[row, col])!r} vs {float(e[row, col])!r}"
+    return True, max_abs, ""
+
+
+def print_report(rows, columns):
+    widths = [max(len(str(c)), *(len(str(r[i])) for r in rows)) for i, c in enumerate(columns)]
+    print("  ".join(str(c).ljust(w) for c, w in zip(columns, widths)))
+    print("  ".join("-" * w for w in widths))
+    for r in rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(r, widths)))
+
+
+def fmt_seconds(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.1f} ms"
+
+
+# === FREEZE ===
+def freeze(repeat=REPEAT):
+    # Rewrites golden/ from the current code; commit the result together with the change that justified it
+    shutil.rmtree(GOLDEN_DIR, ignore_errors=True)
+    synthetic_folder = os.path.join(GOLDEN_DIR, "synthetic")
+    reference = write_synthetic_inputs(synthetic_folder)
+    manifest = {"created": datetime.date.today().isoformat(), "tolerance": list(GOLDEN_TOLERANCE), "cases": {}}
+
+    for case, folder in ((real_case(), os.path.join(GOLDEN_DIR, "real")), (synthetic_case(synthetic_folder, reference), synthetic_folder)):
+        os.makedirs(folder, exist_ok=True)
+        entry = {"reference": case["reference"], "stages": {}}
+        with tempfile.TemporaryDirectory() as workdir:
+            for stage, (needs, fn) in GOLDEN_STAGES.items():
+                if not has_inputs(case, needs):
+                    print(f"⚠️ {case['name']}: skipping {stage} (no input)")
+                    continue
+                seconds, result = timed(fn, case, workdir, repeat)
+                output_file = os.path.join(folder, f"{stage}.csv")
+                result.to_csv(output_file, index=False)
+                entry["stages"][stage] = {"file": os.path.relpath(output_file).replace(os.sep, "/"),
+                                          "rows": len(result), "columns": list(result.columns),
+                                          "sha256": file_hash(output_file), "seconds": round(seconds, 4)}
+                print(f"🧊 {case['name']} {stage}: {len(result)} rows -> {output_file}")
+        # Synthetic inputs are hashed after the upstream outputs they feed on exist
+        entry["inputs"] = input_hashes(case)
+        manifest["cases"][case["name"]] = entry
+
+    with open(MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"✅ Golden fixtures written to {GOLDEN_DIR}/")
+
+
+# === CHECK ===
+def check(repeat=REPEAT):
+    if not os.path.exists(MANIFEST_FILE):
+        print(f"🚫 No {MANIFEST_FILE}; run: python regression_harness.py freeze")
+        return False
+    with open(MANIFEST_FILE, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    rtol, atol = manifest.get("tolerance", GOLDEN_TOLERANCE)
+
+    rows, all_ok = [], True
+    for name, entry in manifest["cases"].items():
+        case = real_case() if name == "real" else synthetic_case(os.path.join(GOLDEN_DIR, name), entry["reference"])
+        changed = [path for path, digest in entry["inputs"].items()
+                   if not os.path.exists(path) or file_hash(path) != digest]
+        if name == "real" and changed:
+            # New downloads are not drift; the fixtures just describe older data
+            print(f"⚠️ real: inputs changed since freeze ({', '.join(changed)}); refreeze to check them")
+            continue
+        with tempfile.TemporaryDirectory() as workdir:
+            for stage, info in entry["stages"].items():
+                seconds, result = timed(GOLDEN_STAGES[stage][1], case, workdir, repeat)
+                golden = pd.read_csv(info["file"], float_precision="round_trip")
+                ok, max_abs, note = compare_frames(golden, result, KEYS[stage], rtol, atol)
+                all_ok &= ok
+                rows.append([name, stage, len(result), f"{max_abs:.3g}", fmt_seconds(info.get("seconds")),
+                             fmt_seconds(seconds), "✅" if ok else f"❌ {note}"])
+
+    print_report(rows, ["case", "stage", "rows", "max |diff|", "frozen", "now", "result"])
+    print("\n✅ All stages match golden/" if all_ok else "\n❌ Output drift against golden/")
+    return all_ok
+
+
+# === DIFF ===
+def diff_case(case, repeat=REPEAT):
+    rows, all_ok = [], True
+    with tempfile.TemporaryDirectory() as workdir:
+        # Yearly partitions of the daily inputs for the out-of-core engine (setup, not timed)
+        if case.get("daily"):
+            case["daily_store"] = os.path.join(workdir, "daily_store")
+            partition_file(case["daily"], case["daily_store"])
+        if case.get("daily_scaled"):
+            case["scaled_store"] = os.path.join(workdir, "scaled_store")
+            partition_file(case["daily_scaled"], case["scaled_store"])
+
+        for name, key_stage, needs, base_label, base_fn, new_label, new_fn in DIFF_PAIRS:
+            if not has_inputs(case, needs):
+                rows.append([case["name"], name, "-", "-", "-", "-", "-", "⏭️ no input"])
+                continue
+            if name == "merge" and len({tuple(read_trends_columns(f)) for f in case["chunks"]}) > 1:
+                rows.append([case["name"], name, "-", "-", "-", "-", "-", "⏭️ mismatched headers (legacy renames)"])
+                continue
+            base_seconds, expected = timed(base_fn, case, workdir, repeat)
+            new_seconds, actual = timed(new_fn, case, workdir, repeat)
+            rtol, atol = DIFF_TOLERANCE[name]
+            ok, max_abs, note = compare_frames(expected, actual, KEYS[key_stage], rtol, atol)
+            all_ok &= ok
+            rows.append([case["name"], name, f"{base_label} {fmt_seconds(base_seconds)}",
+                         f"{new_label} {fmt_seconds(new_seconds)}", f"{base_seconds / new_seconds:.1f}x",
+                         f"{max_abs:.3g}", f"{rtol:g}/{atol:g}", "✅" if ok else f"❌ {note}"])
+    return rows, all_ok
+
+
+def diff(n_keywords=SYNTHETIC_KEYWORDS, years=SYNTHETIC_YEARS, repeat=REPEAT, cases=("real", "synthetic")):
+    rows, all_ok = [], True
+    if "real" in cases:
+        case_rows, ok = diff_case(real_case(), repeat)
+        rows += case_rows
+        all_ok &= ok
+    if "synthetic" in cases:
+        with tempfile.TemporaryDirectory() as folder:
+            # Upstream outputs for the downstream stages come from the current code
+            case = synthetic_case(folder, write_synthetic_inputs(folder, n_keywords, years))
+            with contextlib.redirect_stdout(io.StringIO()):
+                current_merge(case, folder)
+                os.replace(os.path.join(folder, "synthetic_combined_daily.csv"), case["daily"])
+                current_rescale(case, folder).to_csv(case["daily_scaled"], index=False)
+            case["name"] = f"synthetic {n_keywords}kw x {years}y"
+            case_rows, ok = diff_case(case, repeat)
+            rows += case_rows
+            all_ok &= ok
+
+    print_report(rows, ["case", "stage", "baseline", "candidate", "speedup", "max |diff|", "rtol/atol", "result"])
+    print("\n✅ Candidates match their baselines" if all_ok else "\n❌ Differences beyond tolerance")
+    return all_ok
+
+
+if __name__ == "__main__":
+    # Usage: python regression_harness.py [check | freeze | diff [--keywords N] [--years N] [--case real|synthetic]]
+    #                                     [--repeat N]
+    args = sys.argv[1:]
+
+    def option(name, default):
+        return args[args.index(name) + 1] if name in args else default
+
+    mode = args[0] if args and not args[0].startswith("--") else "check"
+    repeat = int(option("--repeat", REPEAT))
+    if mode == "freeze":
+        freeze(repeat)
+        ok = True
+    elif mode == "diff":
+        cases = (option("--case", None),) if "--case" in args else ("real", "synthetic")
+        ok = diff(int(option("--keywords", SYNTHETIC_KEYWORDS)), int(option("--years", SYNTHETIC_YEARS)), repeat, cases)
+    elif mode == "check":
+        ok = check(repeat)
+    else:
+        print(f"🚫 Unknown mode: {mode}")
+        ok = False
+    sys.exit(0 if ok else 1)
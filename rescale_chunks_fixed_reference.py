@@ -1,63 +1,78 @@
+import numpy as np
 import pandas as pd
 import os
-import re
-
-def safe_filename(name):
-    return re.sub(r'[\\/:"*?<>|]+', "_", name)
-
-# === SETTINGS ===
-REFERENCE_KEYWORD = "Combined Graduate Level Examination: (India)"
-INPUT_FOLDER = "downloads_daily_chunks"
-OUTPUT_FOLDER = "merged"
-
-safe_keyword = safe_filename(REFERENCE_KEYWORD)
-output_file = f"{OUTPUT_FOLDER}/{safe_keyword}_combined_daily_scaled.csv"
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
-
-# === STEP 1: Gather all daily chunk CSVs ===
-files = sorted([
-    os.path.join(INPUT_FOLDER, f)
-    for f in os.listdir(INPUT_FOLDER)
-    if f.endswith(".csv")
-])
-
-if not files:
-    print("[ERROR] No files found in downloads_daily_chunks/")
-    exit()
-
-# === STEP 2: Find GLOBAL MAX of the reference keyword across all chunks ===
-global_max = 0
-for file in files:
-    df = pd.read_csv(file, skiprows=2)
-    if REFERENCE_KEYWORD not in df.columns:
-        print(f"[ERROR] Reference keyword '{REFERENCE_KEYWORD}' not found in {file}")
+import sys
+from trends_config import load_registry
+from trends_csv import parse_many, to_frame
+
+# === SCALING ===
+def fixed_reference_scale(tables, reference_keyword):
+    # Returns (scaled frame, global max of the reference); raises ValueError if a chunk lacks the reference
+    # === STEP 2: Find GLOBAL MAX of the reference keyword across all chunks ===
+    # Each chunk is parsed once ("<1" -> 0, same as the old to_numeric + fillna(0)) and reused below
+    global_max = 0
+    for table in tables:
+        if reference_keyword not in table.columns:
+            raise ValueError(f"Reference keyword '{reference_keyword}' not found in {table.path}")
+        ref_vals = np.nan_to_num(table.values[:, table.columns.index(reference_keyword)])
+        global_max = max(global_max, ref_vals.max(initial=0))
+
+    # Step 3: Scale others relative to reference keyword
+    rescaled_chunks = []
+
+    for table in tables:
+        df = to_frame(table, date_column="Date")
+
+        df_scaled = df.copy()
+        ref_col = df[reference_keyword].fillna(0)
+
+        for col in table.columns:
+            if col != reference_keyword:
+                other_col = df[col].fillna(0)
+                df_scaled[col] = (other_col / ref_col.replace(0, np.nan)) * 100  # avoid div by 0
+                df_scaled[col] = df_scaled[col].fillna(0)
+
+        df_scaled[reference_keyword] = ref_col  # keep ref keyword unchanged
+        rescaled_chunks.append(df_scaled)
+
+    # === STEP 4: Concatenate all chunks ===
+    return pd.concat(rescaled_chunks).sort_values("Date"), global_max
+
+
+if __name__ == "__main__":
+    # === SETTINGS ===
+    # The reference can be given as a short name, topic id or export column; defaults to the configured one
+    config = load_registry()
+    reference = config.resolve(sys.argv[1]) if len(sys.argv) > 1 else config.reference_keyword
+    if reference is None:
+        print(f"[ERROR] Unknown reference keyword: {sys.argv[1]}")
+        sys.exit(1)
+    REFERENCE_KEYWORD = reference.display_name
+    INPUT_FOLDER = config.paths.daily_chunks_dir
+    OUTPUT_FOLDER = config.paths.merged_dir
+
+    output_file = config.paths.fixed_reference_file(REFERENCE_KEYWORD)
+    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+
+    # === STEP 1: Gather all daily chunk CSVs ===
+    files = sorted([
+        os.path.join(INPUT_FOLDER, f)
+        for f in os.listdir(INPUT_FOLDER)
+        if f.endswith(".csv")
+    ])
+
+    if not files:
+        print(f"[ERROR] No files found in {INPUT_FOLDER}/")
         exit()
-    ref_vals = pd.to_numeric(df[REFERENCE_KEYWORD], errors="coerce").fillna(0)
-    global_max = max(global_max, ref_vals.max())
-
-print(f" Global max for '{REFERENCE_KEYWORD}': {global_max}")
-
-# Step 3: Scale others relative to reference keyword
-rescaled_chunks = []
-
-for file in files:
-    df = pd.read_csv(file, skiprows=2)
-    df.rename(columns={"Day": "Date"}, inplace=True)
-    df["Date"] = pd.to_datetime(df["Date"])
-    
-    df_scaled = df.copy()
-    ref_col = pd.to_numeric(df[REFERENCE_KEYWORD], errors="coerce").fillna(0)
-
-    for col in df.columns:
-        if col != "Date" and col != REFERENCE_KEYWORD:
-            other_col = pd.to_numeric(df[col], errors="coerce").fillna(0)
-            df_scaled[col] = (other_col / ref_col.replace(0, pd.NA)) * 100  # avoid div by 0
-            df_scaled[col] = df_scaled[col].fillna(0)
-    
-    df_scaled[REFERENCE_KEYWORD] = ref_col  # keep ref keyword unchanged
-    rescaled_chunks.append(df_scaled)
-
-# === STEP 4: Concatenate all chunks and save ===
-final_df = pd.concat(rescaled_chunks).sort_values("Date")
-final_df.to_csv(output_file, index=False)
-print(f"Saved combined scaled data to {output_file}")
\ No newline at end of file
+
+    try:
+        final_df, global_max = fixed_reference_scale(parse_many(files, dtype=np.float64), REFERENCE_KEYWORD)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        exit()
+
+    print(f" Global max for '{REFERENCE_KEYWORD}': {global_max}")
+    # Neighbouring chunks share their boundary day: one row per date (mean of the chunks), like merge_chunks.py
+    final_df = final_df.groupby("Date", as_index=False).mean()
+    final_df.to_csv(output_file, index=False)
+    print(f"Saved combined scaled data to {output_file}")
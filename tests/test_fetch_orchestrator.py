@@ -0,0 +1,106 @@
+import asyncio
+import os
+
+import pytest
+
+from download_cache import make_query
+from fake_trends_server import start_fake_server
+from fetch_orchestrator import FetchOrchestrator, HttpFetcher, fetch_and_merge
+from merge_chunks import merge_group
+
+# FetchOrchestrator against the local fake Trends server: concurrency cap, dedup, per-host pacing, completion order
+
+
+@pytest.fixture
+def fake_server():
+    servers = []
+
+    def start(latency=0.2):
+        server, base_url = start_fake_server(latency=latency)
+        servers.append(server)
+        return server, base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def queries(n, geo="IN", keywords=("/g/a", "/g/b")):
+    return [make_query(geo, keywords, f"2024-01-{i + 1:02d}", f"2024-03-{i + 1:02d}") for i in range(n)]
+
+
+async def collect(orchestrator, batch):
+    return [item async for item in orchestrator.stream(batch)]
+
+
+def test_never_more_than_concurrency_requests_in_flight(fake_server):
+    server, base_url = fake_server(latency=0.2)
+    orchestrator = FetchOrchestrator(HttpFetcher(base_url), concurrency=2, min_interval=0)
+    results = asyncio.run(collect(orchestrator, queries(6)))
+
+    assert all(error is None for _, _, error in results)
+    assert server.request_count == 6
+    assert server.max_active <= 2
+
+
+def test_duplicate_queries_share_one_request(fake_server):
+    server, base_url = fake_server(latency=0.2)
+    orchestrator = FetchOrchestrator(HttpFetcher(base_url), concurrency=4, min_interval=0)
+    query = queries(1)[0]
+    # Same query with the keywords in another order: make_query normalizes it to the same cache key
+    duplicate = make_query("in", ["/g/b", "/g/a"], "2024-01-01", "2024-03-01")
+
+    async def run():
+        return await asyncio.gather(orchestrator.fetch(query), orchestrator.fetch(duplicate), orchestrator.fetch(query))
+
+    bodies = asyncio.run(run())
+    assert server.request_count == 1
+    assert orchestrator.stats["coalesced"] == 2
+    assert bodies[0] == bodies[1] == bodies[2]
+
+
+def test_request_starts_are_paced_per_host(fake_server):
+    server, base_url = fake_server(latency=0.05)
+    orchestrator = FetchOrchestrator(HttpFetcher(base_url), concurrency=4, min_interval=0.3)
+    asyncio.run(collect(orchestrator, queries(4)))
+
+    starts = sorted(t for t, _ in server.request_log)
+    assert len(starts) == 4
+    # Small allowance for the time between the client's start slot and the server logging the request
+    assert all(later - earlier >= 0.25 for earlier, later in zip(starts, starts[1:]))
+
+
+class DelayedFetcher:
+    # Answers each query after its own delay, so the finishing order differs from the submission order
+    host = "delayed"
+
+    def __init__(self, delays):
+        self.delays = delays
+
+    async def __call__(self, query):
+        await asyncio.sleep(self.delays[query["date"]])
+        return query["date"].encode("utf-8")
+
+
+def test_results_arrive_in_completion_order():
+    batch = queries(3)
+    delays = dict(zip([q["date"] for q in batch], [0.3, 0.1, 0.2]))
+    orchestrator = FetchOrchestrator(DelayedFetcher(delays), concurrency=3, min_interval=0)
+    results = asyncio.run(collect(orchestrator, batch))
+
+    assert [query["date"] for query, _, _ in results] == [batch[1]["date"], batch[2]["date"], batch[0]["date"]]
+
+
+def test_running_merge_writes_the_merge_chunks_file(fake_server, tmp_path):
+    _, base_url = fake_server(latency=0)
+    spans = [("2024-01-01", "2024-07-01"), ("2024-07-01", "2025-01-01"), ("2025-01-01", "2025-03-01")]
+    jobs = [(make_query("IN", ["/g/a", "/g/b"], s, e), str(tmp_path / f"grp_{s}_to_{e}.csv")) for s, e in spans]
+    orchestrator = FetchOrchestrator(HttpFetcher(base_url), concurrency=3, min_interval=0)
+    merges, failed = asyncio.run(fetch_and_merge(orchestrator, jobs))
+
+    assert not failed and list(merges) == ["grp"]
+    merges["grp"].write(str(tmp_path / "running.csv"))
+    expected = merge_group("grp", sorted(path for _, path in jobs), str(tmp_path / "merged"))
+    with open(tmp_path / "running.csv", "rb") as a, open(expected, "rb") as b:
+        assert a.read() == b.read()
+    assert os.path.basename(expected) == "grp_combined_daily.csv"
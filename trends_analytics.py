@@ -0,0 +1,205 @@
+import sys
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from trends_config import load_registry
+from trends_store import read_table, source_version
+
+# === CONFIGURATION ===
+DAILY_FILE = load_registry().daily_scaled_file
+ZSCORE_WINDOW = 28
+ZSCORE_THRESHOLD = 3.0
+ZSCORE_MIN_STD = 1.0  # interest points; keeps near-constant stretches from turning tiny wiggles into spikes
+TREND_WINDOW = 31
+SEASONAL_SMOOTHING = 15
+ROBUST_PASSES = 2
+SLOPE_DAYS = 90
+
+# All functions below take a (days x keywords) float array and work on every keyword at once.
+
+
+# === HELPERS ===
+def _fill_gaps(dates, values):
+    # Reindex onto a contiguous daily calendar and interpolate holes so every row is one day
+    full = np.arange(dates[0], dates[-1] + np.timedelta64(1, "D"), dtype="datetime64[D]")
+    frame = pd.DataFrame(values, index=pd.DatetimeIndex(dates.astype("datetime64[ns]")))
+    frame = frame.reindex(pd.DatetimeIndex(full.astype("datetime64[ns]")))
+    frame = frame.interpolate(limit_direction="both").fillna(0.0)
+    return full, frame.to_numpy(dtype=np.float64)
+
+
+def _moving_average(values, window, circular=False):
+    # Centered moving average along axis 0; edges use the shrunken window instead of padding with zeros
+    half = window // 2
+    if circular:
+        if not half:
+            return values.copy()
+        width = 2 * half + 1
+        padded = np.concatenate([values[-half:], values, values[:half]])
+        csum = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(padded, axis=0)])
+        return (csum[width:] - csum[:-width]) / width
+    n = len(values)
+    csum = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+    idx = np.arange(n)
+    lo = np.clip(idx - half, 0, n)
+    hi = np.clip(idx + half + 1, 0, n)
+    return (csum[hi] - csum[lo]) / (hi - lo)[:, None]
+
+
+def _group_means(values, groups, n_groups, weights):
+    # Weighted per-group mean along axis 0, one bincount-style accumulation for all keywords together
+    sums = np.zeros((n_groups, values.shape[1]))
+    totals = np.zeros((n_groups, values.shape[1]))
+    np.add.at(sums, groups, values * weights)
+    np.add.at(totals, groups, weights)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(totals > 0, sums / totals, 0.0)
+
+
+# === ROLLING Z-SCORE SPIKES ===
+def rolling_zscores(values, window=ZSCORE_WINDOW, min_std=ZSCORE_MIN_STD):
+    # z-score of each day against the trailing `window` days before it (the day itself is excluded); the std is
+    # floored at min_std
+    n, k = values.shape
+    csum = np.vstack([np.zeros((1, k)), np.cumsum(values, axis=0)])
+    csq = np.vstack([np.zeros((1, k)), np.cumsum(values ** 2, axis=0)])
+    idx = np.arange(n)
+    lo = np.clip(idx - window, 0, n)
+    count = (idx - lo)[:, None]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (csum[idx] - csum[lo]) / count
+        var = (csq[idx] - csq[lo]) / count - mean ** 2
+        std = np.maximum(np.sqrt(np.clip(var, 0, None)), min_std)
+        z = (values - mean) / std
+    z[(idx < window)[:, None] | ~np.isfinite(z)] = 0.0
+    return z
+
+
+# === SEASONAL DECOMPOSITION ===
+def decompose(dates, values, trend_window=TREND_WINDOW, seasonal_smoothing=SEASONAL_SMOOTHING, passes=ROBUST_PASSES):
+    # STL-style loop: trend by moving average, yearly and weekly seasonals by day-of-year / day-of-week means,
+    # then robustness weights that down-weight large residuals (exam-result spikes) on the next pass.
+    day_of_year = (dates - dates.astype("datetime64[Y]")).astype(int)
+    day_of_week = (dates.astype(int) + 3) % 7
+    weights = np.ones_like(values)
+    seasonal = np.zeros_like(values)
+
+    for _ in range(passes + 1):
+        trend = _moving_average(values - seasonal, trend_window)
+        detrended = values - trend
+
+        yearly = _group_means(detrended, day_of_year, 366, weights)
+        yearly = _moving_average(yearly, seasonal_smoothing, circular=True)
+        yearly -= yearly.mean(axis=0)
+
+        weekly = _group_means(detrended - yearly[day_of_year], day_of_week, 7, weights)
+        weekly -= weekly.mean(axis=0)
+
+        seasonal = yearly[day_of_year] + weekly[day_of_week]
+        resid = values - trend - seasonal
+
+        # Bisquare weights on |resid| / (6 * median |resid|), as in STL's outer loop
+        scale = 6 * np.median(np.abs(resid), axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            u = np.where(scale > 0, np.abs(resid) / scale, 0.0)
+        weights = np.where(u < 1, (1 - u ** 2) ** 2, 0.0)
+
+    return trend, seasonal, resid, yearly
+
+
+def seasonal_strength(seasonal, resid):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        strength = 1 - resid.var(axis=0) / (seasonal + resid).var(axis=0)
+    return np.clip(np.nan_to_num(strength), 0, 1)
+
+
+def trend_slope(trend, days=SLOPE_DAYS):
+    # Least-squares slope (interest points per day) of the trend over the last `days` days
+    tail = trend[-days:]
+    x = np.arange(len(tail)) - (len(tail) - 1) / 2
+    return (x[:, None] * (tail - tail.mean(axis=0))).sum(axis=0) / (x ** 2).sum()
+
+
+# === PEAKS ===
+def yearly_peaks(dates, values):
+    # Peak day and value for every (calendar year, keyword) without looping over keywords
+    years = dates.astype("datetime64[Y]").astype(int) + 1970
+    rows = []
+    for year in np.unique(years):
+        mask = years == year
+        block = values[mask]
+        top = block.argmax(axis=0)
+        rows.append((year, dates[mask][top], block[top, np.arange(values.shape[1])]))
+    return rows
+
+
+# === FULL ANALYSIS ===
+def analyze(dates, columns, values, window=ZSCORE_WINDOW, threshold=ZSCORE_THRESHOLD):
+    order = np.argsort(dates)
+    dates, values = _fill_gaps(dates[order], np.asarray(values, dtype=np.float64)[order])
+    columns = list(columns)
+
+    # Spikes are scored on the residual, so seasonal ramps and the trend itself are not flagged
+    trend, seasonal, resid, yearly = decompose(dates, values)
+    z = rolling_zscores(resid, window)
+    strength = seasonal_strength(seasonal, resid)
+    slope = trend_slope(trend)
+    index = pd.DatetimeIndex(dates.astype("datetime64[ns]"), name="Day")
+
+    day_idx, col_idx = np.nonzero(z > threshold)
+    spikes = pd.DataFrame({
+        "Day": index[day_idx],
+        "Keyword": np.asarray(columns, dtype=object)[col_idx],
+        "Interest": values[day_idx, col_idx],
+        "Z-Score": np.round(z[day_idx, col_idx], 2),
+    }).sort_values(["Day", "Keyword"], ignore_index=True)
+
+    peak_rows = []
+    for year, peak_days, peak_values in yearly_peaks(dates, values):
+        for kw, day, value in zip(columns, peak_days, peak_values):
+            peak_rows.append({"Keyword": kw, "Year": int(year), "Peak Day": pd.Timestamp(day).date(),
+                              "Peak Interest": round(float(value), 2)})
+    peaks = pd.DataFrame(peak_rows, columns=["Keyword", "Year", "Peak Day", "Peak Interest"])
+
+    # Peak season = day of year where the smoothed yearly component is highest (shown on a leap-year calendar)
+    season_day = yearly.argmax(axis=0)
+    season_dates = np.datetime64("2024-01-01") + season_day.astype("timedelta64[D]")
+    seasonality = pd.DataFrame({
+        "Keyword": columns,
+        "Peak Season": [pd.Timestamp(d).strftime("%b %d") for d in season_dates],
+        "Seasonal Strength": np.round(strength, 3),
+        f"Trend Slope ({SLOPE_DAYS}d)": np.round(slope, 4),
+        "Spikes": np.bincount(col_idx, minlength=len(columns)),
+    })
+
+    return {
+        "spikes": spikes,
+        "peaks": peaks,
+        "seasonality": seasonality,
+        "trend": pd.DataFrame(trend, index=index, columns=columns),
+        "seasonal": pd.DataFrame(seasonal, index=index, columns=columns),
+        "resid": pd.DataFrame(resid, index=index, columns=columns),
+        "zscore": pd.DataFrame(z, index=index, columns=columns),
+    }
+
+
+@lru_cache(maxsize=8)
+def _analyze_cached(path, version, window, threshold):
+    table = read_table(path, dtype=np.float64)
+    return analyze(table.dates, table.columns, table.values, window, threshold)
+
+
+def analyze_file(path=DAILY_FILE, window=ZSCORE_WINDOW, threshold=ZSCORE_THRESHOLD):
+    # Results are reused until the file's (or store's) data version changes
+    return _analyze_cached(path, source_version(path), window, threshold)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else DAILY_FILE
+    results = analyze_file(path)
+    print(f"📊 Seasonality for {path}")
+    print(results["seasonality"].to_string(index=False))
+    print(f"\n⚡ {len(results['spikes'])} spikes (z > {ZSCORE_THRESHOLD}), latest:")
+    print(results["spikes"].tail(10).to_string(index=False))
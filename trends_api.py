@@ -0,0 +1,331 @@
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import traceback
+from collections import OrderedDict
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from aggregate_cube import AUC_WINDOWS, auc_bounds, auc_table, cube_path, period_windows, update_cube
+from trends_config import load_registry
+from trends_store import PartitionedStore, read_table, source_version
+
+# Local read-only query service next to app.py, for tools that poll the data:
+#   GET /meta                                       keywords, geos, scaling modes, date bounds, data version
+#   GET /series?keywords=SSC CGL,NDA&start=2024-01-01&end=2024-12-31&granularity=month&scaling=weekly-rescaled
+#   GET /auc?keywords=...&start=...&end=...&window=6month&scaling=weekly-rescaled
+# Common parameters: geo (default: primary geo), format=json|arrow (or Accept: application/vnd.apache.arrow.stream).
+# JSON is gzipped when the client accepts it. Every response carries an ETag built from the data version and the
+# normalized query, so polling clients get 304 Not Modified until the underlying files change.
+
+# === CONFIGURATION ===
+config = load_registry()
+HOST = "127.0.0.1"
+PORT = 8600
+CACHE_ENTRIES = 256
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+SCALING_MODES = ("raw", "weekly-rescaled", "fixed-reference")
+GRANULARITIES = ("day", "week", "month", "6month", "year")
+STATS = ("mean", "sum", "max", "area", "count")
+CUBE_NAMES = {"raw": "daily", "weekly-rescaled": "daily_scaled", "fixed-reference": "fixed_reference"}
+
+
+class QueryError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# === SOURCES ===
+def source_path(scaling, geo):
+    if scaling == "raw":
+        path = config.daily_file if geo == config.primary_geo else None
+    elif scaling == "weekly-rescaled":
+        store = config.store_folder(geo)
+        if PartitionedStore(store).exists():
+            path = store
+        else:
+            path = config.daily_scaled_file if geo == config.primary_geo else None
+    else:
+        path = config.fixed_reference_file if geo == config.primary_geo else None
+    if path is None or not _exists(path):
+        raise QueryError(404, f"No '{scaling}' data for geo {geo}")
+    return path
+
+
+def _exists(path):
+    return os.path.isfile(path) or PartitionedStore(path).exists()
+
+
+@lru_cache(maxsize=16)
+def _load_cube(path, name, geo, version):
+    # Same persisted cubes as the dashboard (cube/<geo>_<name>.npz), extended with just the new days
+    return update_cube(path, cube_path(geo, name), geo)[0]
+
+
+def load_cube(path, name, geo):
+    return _load_cube(path, name, geo, source_version(path))
+
+
+# === QUERIES ===
+def _param(params, name, default=None):
+    value = params.get(name, [default])[0]
+    return value.strip() if isinstance(value, str) else value
+
+
+def _date(params, name, default):
+    value = _param(params, name)
+    if not value:
+        return default
+    try:
+        return np.datetime64(value, "D")
+    except ValueError:
+        raise QueryError(400, f"Bad {name} date: {value}")
+
+
+def _choice(params, name, options, default):
+    value = _param(params, name, default)
+    if value not in options:
+        raise QueryError(400, f"{name} must be one of {', '.join(options)}")
+    return value
+
+
+def normalize(params, cube):
+    # Resolves names to export columns and fills defaults, so equivalent queries share one cache entry and ETag
+    wanted = [k for k in (_param(params, "keywords") or "").split(",") if k.strip()]
+    if wanted:
+        keywords = []
+        for value in wanted:
+            keyword = config.resolve(value)
+            column = keyword.display_name if keyword else value.strip()
+            if column not in cube.columns:
+                raise QueryError(400, f"Unknown keyword: {value}")
+            keywords.append(column)
+    else:
+        keywords = list(cube.columns)
+    first, last = (cube.dates[0], cube.dates[-1]) if len(cube.dates) else (np.datetime64("NaT"), np.datetime64("NaT"))
+    start, end = _date(params, "start", first), _date(params, "end", last)
+    if start > end:
+        raise QueryError(400, f"start ({start}) is after end ({end})")
+    return keywords, start, end
+
+
+def series_frame(params):
+    geo = (_param(params, "geo") or config.primary_geo).upper()
+    scaling = _choice(params, "scaling", SCALING_MODES, "weekly-rescaled")
+    granularity = _choice(params, "granularity", GRANULARITIES, "day")
+    stat = _choice(params, "stat", STATS, "mean")
+    path = source_path(scaling, geo)
+    cube = load_cube(path, CUBE_NAMES[scaling], geo)
+    keywords, start, end = normalize(params, cube)
+    key = ("series", geo, scaling, granularity, stat, tuple(keywords), str(start), str(end))
+
+    def build():
+        if granularity == "day":
+            table = read_table(path, usecols=keywords, dtype=np.float64, start=start, end=end)
+            frame = pd.DataFrame(table.values, columns=table.columns)[keywords]
+            frame.insert(0, "Date", table.dates.astype(str))
+            return frame
+        # Calendar periods answered from the prefix-sum cube; end is inclusive like the daily slice
+        bounds = period_windows(start, end + np.timedelta64(1, "D"), granularity)
+        long = cube.window_frame(bounds)
+        long = long[long["Keyword"].isin(keywords)]
+        frame = long.pivot(index="Start", columns="Keyword", values=stat).reindex(columns=keywords)
+        frame.index = frame.index.strftime("%Y-%m-%d")
+        return frame.rename_axis(None, axis=1).rename_axis("Date").reset_index()
+
+    return key, [path], build
+
+
+def auc_frame(params):
+    geo = (_param(params, "geo") or config.primary_geo).upper()
+    scaling = _choice(params, "scaling", SCALING_MODES, "weekly-rescaled")
+    window = _choice(params, "window", AUC_WINDOWS, "6month")
+    weekly_path = config.paths.weekly_file(geo)
+    if not _exists(weekly_path):
+        raise QueryError(404, f"No weekly data for geo {geo}")
+    daily_path = source_path(scaling, geo)
+    weekly_cube = load_cube(weekly_path, "weekly", geo)
+    daily_cube = load_cube(daily_path, CUBE_NAMES[scaling], geo)
+    keywords, start, end = normalize(params, weekly_cube)
+    keywords = [k for k in keywords if k in daily_cube.columns]
+    key = ("auc", geo, scaling, window, tuple(keywords), str(start), str(end))
+
+    def build():
+        # Same windows and ratio as the dashboard's AUC table, anchored on the weekly dates in range
+        bounds = auc_bounds(weekly_cube.dates[(weekly_cube.dates >= start) & (weekly_cube.dates <= end)], window)
+        return auc_table(weekly_cube.window_frame(bounds), daily_cube.window_frame(bounds), keywords)
+
+    return key, [weekly_path, daily_path], build
+
+
+def meta_frame(params):
+    path = source_path("weekly-rescaled", config.primary_geo)
+    cube = load_cube(path, CUBE_NAMES["weekly-rescaled"], config.primary_geo)
+    key = ("meta",)
+
+    def build():
+        return {
+            "geos": config.geos,
+            "primary_geo": config.primary_geo,
+            "keywords": [{"name": k.name, "topic_id": k.topic_id, "geo": k.geo, "column": k.display_name}
+                         for k in config.keywords],
+            "reference": config.reference_keyword.name,
+            "scaling": list(SCALING_MODES),
+            "granularity": list(GRANULARITIES),
+            "auc_windows": list(AUC_WINDOWS),
+            "start": str(cube.dates[0]) if len(cube.dates) else None,
+            "end": str(cube.dates[-1]) if len(cube.dates) else None,
+            "version": source_version(path),
+        }
+
+    return key, [path], build
+
+
+ROUTES = {"/series": series_frame, "/auc": auc_frame, "/meta": meta_frame}
+
+
+# === ENCODING ===
+def encode_json(result):
+    if isinstance(result, pd.DataFrame):
+        # Column-oriented: one list per column is much smaller than one object per row
+        result = {col: [None if isinstance(v, float) and np.isnan(v) else v for v in result[col].tolist()]
+                  for col in result.columns}
+    return json.dumps(result, separators=(",", ":")).encode("utf-8")
+
+
+def encode_arrow(frame):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise QueryError(406, "pyarrow is not installed; use format=json")
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class ResponseCache:
+    # In-process LRU of encoded responses, keyed on the ETag (data version, normalized query, format, gzip)
+    def __init__(self, max_entries=CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+cache = ResponseCache()
+
+
+def respond(path, params, accept="", accept_encoding="", if_none_match=""):
+    # Returns (status, headers, body) for a GET; shared by the HTTP handler and direct callers
+    route = ROUTES.get(path)
+    if route is None:
+        raise QueryError(404, f"Unknown path {path}; use one of {', '.join(ROUTES)}")
+    key, sources, build = route(params)
+    fmt = _param(params, "format") or ("arrow" if ARROW_TYPE in accept else "json")
+    if fmt not in ("json", "arrow") or (fmt == "arrow" and path == "/meta"):
+        raise QueryError(400, "format must be json or arrow (arrow is not available for /meta)")
+    gzip_ok = fmt == "json" and "gzip" in accept_encoding
+
+    # Gzip and plain bodies are different representations, so they get different ETags
+    version = "|".join(source_version(s) for s in sources)
+    etag = '"' + hashlib.sha1(json.dumps([version, key, fmt, gzip_ok]).encode("utf-8")).hexdigest()[:20] + '"'
+    # The ETag depends only on the query and the data version, so a poller that already has this body gets a 304
+    # without the query being run or encoded, even after a restart or a cache eviction
+    if etag in [t.strip() for t in if_none_match.split(",")]:
+        return 304, {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept, Accept-Encoding"}, b""
+    body = cache.get(etag)
+    if body is None:
+        result = build()
+        body = encode_arrow(result) if fmt == "arrow" else encode_json(result)
+        if gzip_ok:
+            body = gzip.compress(body, compresslevel=6)
+        cache.put(etag, body)
+
+    headers = {
+        "Content-Type": ARROW_TYPE if fmt == "arrow" else "application/json",
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "Vary": "Accept, Accept-Encoding",
+    }
+    if gzip_ok:
+        headers["Content-Encoding"] = "gzip"
+    return 200, headers, body
+
+
+# === SERVER ===
+class TrendsAPIHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        try:
+            status, headers, body = respond(url.path.rstrip("/") or "/meta", params, self.headers.get("Accept", ""),
+                                            self.headers.get("Accept-Encoding", ""),
+                                            self.headers.get("If-None-Match", ""))
+        except QueryError as e:
+            status, headers, body = e.status, {"Content-Type": "application/json"}, encode_json({"error": str(e)})
+        except Exception as e:
+            # Anything unexpected still gets a response instead of a dropped connection
+            traceback.print_exc()
+            status, headers = 500, {"Content-Type": "application/json"}
+            body = encode_json({"error": f"Internal error: {type(e).__name__}: {e}"})
+
+        if status == 304:
+            self.send_response(304)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(host=HOST, port=PORT):
+    server = ThreadingHTTPServer((host, port), TrendsAPIHandler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    # Usage: python trends_api.py [port]
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else PORT
+    server = start_server(port=port)
+    print(f"🌐 Trends API on http://{HOST}:{port} (/meta, /series, /auc) — Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
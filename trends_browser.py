@@ -0,0 +1,55 @@
+import os
+import time
+
+# Selenium is imported inside the functions so scrapers that are fully served from the cache never load it.
+
+DOWNLOAD_NAME = "multiTimeline.csv"
+EXPORT_BUTTON = "button.widget-actions-item.export[title='CSV']"
+
+
+def start_driver(output_dir, chrome_profile=""):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    options = Options()
+    if chrome_profile:
+        options.add_argument(f"--user-data-dir={chrome_profile}")
+    prefs = {
+        "download.default_directory": os.path.abspath(output_dir),
+        "profile.default_content_settings.popups": 0,
+        "download.prompt_for_download": False,
+        "safebrowsing.enabled": True
+    }
+    options.add_experimental_option("prefs", prefs)
+    return webdriver.Chrome(options=options)
+
+
+def wait_for_download(file_path, timeout=20):
+    waited = 0
+    while not os.path.exists(file_path) and waited < timeout:
+        time.sleep(1)
+        waited += 1
+    return os.path.exists(file_path)
+
+
+def click_download_button(driver):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    try:
+        print("⬇️ Looking for download button...")
+        download_btn = WebDriverWait(driver, 20).until(
+            EC.element_to_be_clickable((By.CSS_SELECTOR, EXPORT_BUTTON))
+        )
+        driver.execute_script("arguments[0].click();", download_btn)
+        print("✅ Download initiated.")
+    except Exception as e:
+        print(f"❌ Download button error: {e}")
+
+
+def captcha_check(driver):
+    page = driver.page_source.lower()
+    if "robot" in page or "captcha" in page:
+        print("🤖 CAPTCHA triggered. Please solve manually...")
+        input("🔓 Press Enter after solving CAPTCHA...")
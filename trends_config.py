@@ -0,0 +1,159 @@
+import csv
+import json
+import os
+import re
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+
+# Standard library only: importing the registry must not pull in pandas, Selenium, matplotlib or plotly.
+
+CONFIG_FILE = "trends_config.json"
+
+
+def safe_filename(name):
+    return re.sub(r'[\\/:"*?<>|]+', "_", name)
+
+
+@dataclass(frozen=True)
+class Keyword:
+    name: str            # short label used in keywords.csv, e.g. "SSC CGL"
+    topic_id: str        # Google Trends topic code, e.g. "/g/11c265kd70"
+    geo: str
+    category: str
+    display_name: str    # column header Google writes in exports, e.g. "Combined Graduate Level Examination: (India)"
+
+
+@dataclass(frozen=True)
+class Paths:
+    keywords_csv: str = "keywords.csv"
+    weekly_dir: str = "downloads_compare"
+    daily_chunks_dir: str = "downloads_daily_chunks"
+    incremental_dir: str = "downloads_incremental"
+    merged_dir: str = "merged"
+    meta_dir: str = "meta"
+    cache_dir: str = "cache"
+    cube_dir: str = "cube"
+    store_dir: str = "store"
+
+    @property
+    def last_processed_file(self):
+        return os.path.join(self.meta_dir, "last_processed_date.txt")
+
+    def weekly_file(self, geo):
+        return os.path.join(self.weekly_dir, f"geo_{geo}_compare.csv")
+
+    def daily_file(self, group):
+        return os.path.join(self.merged_dir, f"{group}_combined_daily.csv")
+
+    def daily_scaled_file(self, group):
+        return os.path.join(self.merged_dir, f"{group}_combined_daily_scaled.csv")
+
+    def fixed_reference_file(self, reference_display_name):
+        return os.path.join(self.merged_dir, f"{safe_filename(reference_display_name)}_combined_daily_scaled.csv")
+
+    def incremental_file(self, geo, start, end):
+        return os.path.join(self.incremental_dir, f"geo_{geo}_{start}_to_{end}_compare.csv")
+
+    def store_folder(self, dataset, geo):
+        return os.path.join(self.store_dir, dataset, f"geo={geo}")
+
+
+@dataclass(frozen=True)
+class Registry:
+    keywords: tuple
+    reference: str = "SSC CGL"
+    group_name: str = "5keywords"
+    gprop: str = "youtube"
+    chrome_profile: str = ""
+    paths: Paths = field(default_factory=Paths)
+
+    @property
+    def geos(self):
+        return list(dict.fromkeys(k.geo for k in self.keywords))
+
+    @property
+    def primary_geo(self):
+        # Geo with the most keywords (the daily chunk scraper compares all keywords in one geo)
+        geos = [k.geo for k in self.keywords]
+        return max(self.geos, key=geos.count)
+
+    def by_geo(self):
+        groups = {}
+        for keyword in self.keywords:
+            groups.setdefault(keyword.geo, []).append(keyword)
+        return groups
+
+    def resolve(self, value):
+        # Accepts a short name, topic id or Google display string and returns the Keyword (or None)
+        value = value.strip()
+        for keyword in self.keywords:
+            if value in (keyword.name, keyword.topic_id, keyword.display_name):
+                return keyword
+        return None
+
+    @property
+    def reference_keyword(self):
+        keyword = self.resolve(self.reference)
+        if keyword is None:
+            raise ValueError(f"Reference keyword '{self.reference}' is not in {self.paths.keywords_csv}")
+        return keyword
+
+    def label(self, column):
+        # Short dashboard label for an export column; unknown columns are shown as-is
+        keyword = self.resolve(column)
+        return keyword.name if keyword else column
+
+    @property
+    def weekly_file(self):
+        return self.paths.weekly_file(self.primary_geo)
+
+    @property
+    def daily_file(self):
+        return self.paths.daily_file(self.group_name)
+
+    @property
+    def daily_scaled_file(self):
+        return self.paths.daily_scaled_file(self.group_name)
+
+    @property
+    def fixed_reference_file(self):
+        return self.paths.fixed_reference_file(self.reference_keyword.display_name)
+
+    def store_folder(self, geo=None):
+        return self.paths.store_folder(self.group_name, geo or self.primary_geo)
+
+    def watermark_file(self, geo=None):
+        # The primary geo keeps the original meta/last_processed_date.txt
+        geo = geo or self.primary_geo
+        if geo == self.primary_geo:
+            return self.paths.last_processed_file
+        return os.path.join(self.paths.meta_dir, f"last_processed_date_{geo}.txt")
+
+
+def read_keywords(path):
+    keywords = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            topic_id = row["google_trends_keywords"].strip()
+            keywords.append(Keyword(
+                name=row.get("name", "").strip() or topic_id,
+                topic_id=topic_id,
+                geo=row["geo"].strip(),
+                category=row.get("category_code", "").strip(),
+                display_name=(row.get("display_name") or "").strip() or row.get("name", "").strip() or topic_id,
+            ))
+    return tuple(keywords)
+
+
+@lru_cache(maxsize=None)
+def load_registry(config_file=CONFIG_FILE):
+    # Loaded once per process; settings come from trends_config.json, keywords from the CSV it points to.
+    # TRENDS_CHROME_PROFILE overrides the Chrome profile so it does not have to be committed.
+    settings = {}
+    if os.path.exists(config_file):
+        with open(config_file, "r", encoding="utf-8") as f:
+            settings = json.load(f)
+
+    paths = replace(Paths(), **settings.pop("paths", {}))
+    chrome_profile = os.environ.get("TRENDS_CHROME_PROFILE", settings.pop("chrome_profile", ""))
+    return Registry(keywords=read_keywords(paths.keywords_csv), paths=paths, chrome_profile=chrome_profile, **settings)
@@ -0,0 +1,166 @@
+import csv
+import io
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# === CONFIGURATION ===
+# Google Trends writes "<1" for values that are above zero but round down.
+LESS_THAN_ONE = 0.0
+DATE_HEADERS = ("day", "week", "month", "date")
+MAX_WORKERS = 8
+
+TrendsTable = namedtuple("TrendsTable", ["path", "date_label", "dates", "columns", "values", "preamble"])
+
+
+# === STREAMING READER ===
+class TrendsReader:
+    # Opens a Trends export (or a merged CSV with no preamble) and stops right after the header,
+    # so the metadata lines ("Category: All categories", blanks) are never handed to a CSV parser. Rows come back as
+    # text cells; numbers are only converted by parse_trends_csv.
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, newline="", encoding="utf-8-sig")
+        try:
+            self.date_label, self.columns, self.preamble = _read_header(self._file, path)
+        except ValueError:
+            self._file.close()
+            raise
+        self._reader = csv.reader(self._file)
+
+    def raw_rows(self):
+        width = len(self.columns)
+        for cells in self._reader:
+            if not cells or not cells[0].strip():
+                continue
+            row = cells[1:width + 1]
+            if len(row) < width:
+                row += [""] * (width - len(row))
+            yield cells[0].strip(), row
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_header(file, path):
+    # One pass over the leading lines: (date label, keyword columns, preamble lines); the file is left at the first row
+    preamble = []
+    for line in iter(file.readline, ""):
+        cells = next(csv.reader([line]), [])
+        if cells and cells[0].strip().lower() in DATE_HEADERS:
+            return cells[0].strip(), [c.strip() for c in cells[1:]], preamble
+        preamble.append(",".join(cells))
+    raise ValueError(f"No date header found in {path}")
+
+
+# === PARSING ===
+def parse_trends_csv(path, less_than_one=LESS_THAN_ONE, usecols=None, dtype=np.float32, start=None, end=None):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        date_label, columns, preamble = _read_header(f, path)
+        body = f.read()
+
+    keep = list(range(len(columns))) if usecols is None else [i for i, col in enumerate(columns) if col in usecols]
+    columns = [columns[i] for i in keep]
+    # The rows go to pandas' C parser, which runs without the GIL, so parse_many overlaps files. Trends exports hold
+    # integers only; CSVs written by this repo hold full-precision floats, which are parsed round-trip exact instead
+    # (that path takes the GIL per value). "<1" is rewritten to its value in the text first, so every cell parses
+    # as a plain number; blank cells come back missing.
+    precision = "round_trip" if "." in body else None
+    if "<1" in body:
+        body = body.replace("<1", repr(float(less_than_one)))
+    if body.strip():
+        df = pd.read_csv(io.StringIO(body), header=None, names=list(range(len(keep) + 1)),
+                         usecols=[0] + [i + 1 for i in keep], index_col=0, skipinitialspace=True,
+                         float_precision=precision)
+        day_strings = df.index.to_numpy(dtype=object)
+        if pd.isna(day_strings).any():
+            # Rows without a date are dropped
+            df = df[~pd.isna(day_strings)]
+            day_strings = day_strings[~pd.isna(day_strings)]
+        bad = [col for col, kind in zip(df.columns, df.dtypes) if kind.kind not in "fiub"]
+        if bad:
+            # Unexpected tokens: those cells become missing instead of failing the whole file
+            df[bad] = df[bad].apply(pd.to_numeric, errors="coerce")
+        values = df.to_numpy(dtype=dtype)
+    else:
+        day_strings = np.array([], dtype=object)
+        values = np.empty((0, len(keep)), dtype=dtype)
+
+    # Trends dates are always ISO ("2025-07-01", or "2025-07" for monthly), so numpy parses them
+    # directly without pandas format inference.
+    try:
+        dates = np.array(day_strings.astype(str), dtype="datetime64[D]")
+    except ValueError:
+        dates = np.array(np.char.strip(day_strings.astype(str)), dtype="datetime64[D]")
+
+    # Date-range filter (start and end are inclusive)
+    if start is not None or end is not None:
+        mask = np.ones(len(dates), dtype=bool)
+        if start is not None:
+            mask &= dates >= np.datetime64(start, "D")
+        if end is not None:
+            mask &= dates <= np.datetime64(end, "D")
+        dates = dates[mask]
+        values = values[mask]
+    return TrendsTable(path, date_label, dates, columns, values, preamble)
+
+
+def collapse_days(table):
+    # One row per date. Concatenated chunk outputs (the fixed-reference file) repeat each chunk boundary day; those
+    # rows become the mean of their non-missing values, the same rule merge_chunks.py uses.
+    if len(table.dates) < 2 or (np.diff(table.dates) > np.timedelta64(0, "D")).all():
+        return table
+    days, rows = np.unique(table.dates, return_inverse=True)
+    present = ~np.isnan(table.values)
+    sums = np.zeros((len(days), len(table.columns)))
+    counts = np.zeros((len(days), len(table.columns)))
+    np.add.at(sums, rows, np.where(present, table.values, 0.0))
+    np.add.at(counts, rows, present)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        values = (sums / counts).astype(table.values.dtype)
+    return table._replace(dates=days, values=values)
+
+
+def parse_many(paths, less_than_one=LESS_THAN_ONE, usecols=None, dtype=np.float32, max_workers=MAX_WORKERS,
+               skip_invalid=False):
+    # Returns tables in the same order as paths; with skip_invalid, files without a date header come back as None.
+    def parse(path):
+        try:
+            return parse_trends_csv(path, less_than_one, usecols, dtype)
+        except ValueError:
+            if skip_invalid:
+                return None
+            raise
+
+    paths = list(paths)
+    if len(paths) <= 1:
+        return [parse(p) for p in paths]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(paths))) as pool:
+        return list(pool.map(parse, paths))
+
+
+def to_frame(table, date_column=None, dtype=None):
+    values = table.values if dtype is None else table.values.astype(dtype)
+    df = pd.DataFrame(values, columns=table.columns)
+    df.insert(0, date_column or table.date_label, pd.DatetimeIndex(table.dates.astype("datetime64[ns]")))
+    return df
+
+
+def read_trends_frame(path, date_column=None, less_than_one=LESS_THAN_ONE, usecols=None, dtype=np.float32,
+                      start=None, end=None):
+    return to_frame(parse_trends_csv(path, less_than_one, usecols, dtype, start, end), date_column)
+
+
+def read_trends_columns(path):
+    # Header only: lets callers pick keywords without loading any rows
+    with TrendsReader(path) as reader:
+        return reader.columns
+
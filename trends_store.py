@@ -0,0 +1,192 @@
+import csv
+import os
+import shutil
+
+import numpy as np
+
+from trends_csv import TrendsReader, TrendsTable, collapse_days, parse_trends_csv, read_trends_columns, to_frame
+
+# Append-friendly daily store: store/<dataset>/geo=<GEO>/<year>.csv, one plain "Day,<keywords...>" CSV per year.
+# New days are appended to the last partition only, so a daily refresh never rewrites history, and readers open
+# just the years a date range touches. Every partition parses with trends_csv like any other Trends CSV.
+
+DATE_LABEL = "Day"
+
+
+def _cell(value):
+    return "" if np.isnan(value) else repr(float(value))
+
+
+class PartitionedStore:
+    def __init__(self, folder):
+        self.folder = folder
+
+    def exists(self):
+        return bool(self.partitions())
+
+    def partitions(self):
+        # [(year, path), ...] in year order
+        if not os.path.isdir(self.folder):
+            return []
+        years = [name[:-len(".csv")] for name in os.listdir(self.folder) if name.endswith(".csv")]
+        return [(int(y), os.path.join(self.folder, f"{y}.csv")) for y in sorted(years) if y.isdigit()]
+
+    @property
+    def columns(self):
+        partitions = self.partitions()
+        return read_trends_columns(partitions[-1][1]) if partitions else []
+
+    def version(self):
+        # Changes with every append (size and mtime of the partitions)
+        stats = [os.stat(path) for _, path in self.partitions()]
+        return f"{len(stats)}-{max((s.st_mtime_ns for s in stats), default=0)}-{sum(s.st_size for s in stats)}"
+
+    def first_date(self):
+        partitions = self.partitions()
+        if not partitions:
+            return None
+        with TrendsReader(partitions[0][1]) as reader:
+            for day, _ in reader.raw_rows():
+                return np.datetime64(day, "D")
+        return None
+
+    def last_date(self):
+        # Reads only the tail of the newest partition
+        partitions = self.partitions()
+        if not partitions:
+            return None
+        with open(partitions[-1][1], "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 4096))
+            lines = [line for line in f.read().decode("utf-8").splitlines() if line.strip()]
+        for line in reversed(lines):
+            try:
+                return np.datetime64(line.split(",", 1)[0].strip(), "D")
+            except ValueError:
+                continue
+        return None
+
+    def read_table(self, usecols=None, dtype=np.float32, start=None, end=None):
+        # Partitions outside [start, end] are never opened
+        first = np.datetime64(start, "D").astype(object).year if start is not None else None
+        last = np.datetime64(end, "D").astype(object).year if end is not None else None
+        paths = [path for year, path in self.partitions()
+                 if (first is None or year >= first) and (last is None or year <= last)]
+        tables = [parse_trends_csv(path, usecols=usecols, dtype=dtype, start=start, end=end) for path in paths]
+        if not tables:
+            columns = [c for c in self.columns if usecols is None or c in usecols]
+            return TrendsTable(self.folder, DATE_LABEL, np.array([], dtype="datetime64[D]"), columns,
+                               np.empty((0, len(columns)), dtype=dtype), [])
+        return TrendsTable(self.folder, DATE_LABEL, np.concatenate([t.dates for t in tables]), tables[-1].columns,
+                           np.vstack([t.values for t in tables]), [])
+
+    def append(self, dates, columns, values):
+        # Writes rows for dates after the current last date; columns are matched by name to the store's header
+        # (missing ones are left empty, unknown ones are dropped). Returns the number of rows written.
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        values = np.asarray(values, dtype=np.float64)
+        last = self.last_date()
+        if last is not None:
+            keep = dates > last
+            dates, values = dates[keep], values[keep]
+        if not len(dates):
+            return 0
+
+        header = self.columns or list(columns)
+        positions = {col: i for i, col in enumerate(columns)}
+        aligned = np.full((len(dates), len(header)), np.nan)
+        for j, col in enumerate(header):
+            if col in positions:
+                aligned[:, j] = values[:, positions[col]]
+
+        os.makedirs(self.folder, exist_ok=True)
+        order = np.argsort(dates, kind="stable")
+        years = dates[order].astype("datetime64[Y]").astype(int) + 1970
+        for year in np.unique(years):
+            path = os.path.join(self.folder, f"{year}.csv")
+            new_file = not os.path.exists(path)
+            with open(path, "a", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                if new_file:
+                    writer.writerow([DATE_LABEL] + header)
+                for i in order[years == year]:
+                    writer.writerow([str(dates[i])] + [_cell(v) for v in aligned[i]])
+        return len(dates)
+
+
+def partition_file(source, folder):
+    # Splits one CSV into yearly partitions row by row (cells are copied as-is, nothing is parsed)
+    with TrendsReader(source) as reader:
+        writer = PartitionWriter(folder, reader.columns)
+        for day, cells in reader.raw_rows():
+            writer.write(day, cells)
+    writer.close()
+    return writer.rows
+
+
+class PartitionWriter:
+    # Writes a whole partitioned dataset from rows in day order, one year file at a time. Everything goes to a
+    # sibling ".tmp" folder that replaces the old dataset on close, so readers never see a half-written rebuild.
+    def __init__(self, folder, columns):
+        self.folder = folder
+        self.columns = list(columns)
+        self.tmp_folder = folder + ".tmp"
+        shutil.rmtree(self.tmp_folder, ignore_errors=True)
+        os.makedirs(self.tmp_folder)
+        self._year = None
+        self._file = None
+        self._writer = None
+        self.rows = 0
+
+    def write(self, day, cells):
+        # day is an ISO date string, cells the already formatted values
+        year = day[:4]
+        if year != self._year:
+            if self._file is not None:
+                self._file.close()
+            self._year = year
+            self._file = open(os.path.join(self.tmp_folder, f"{year}.csv"), "w", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow([DATE_LABEL] + self.columns)
+        self._writer.writerow([day] + cells)
+        self.rows += 1
+
+    def write_values(self, dates, values):
+        # Same cells as _cell(), on plain floats from tolist() (v != v only for NaN)
+        rows = np.asarray(values, dtype=np.float64).tolist()
+        for day, row in zip(np.asarray(dates, dtype="datetime64[D]").astype(str), rows):
+            self.write(day, ["" if v != v else repr(v) for v in row])
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        old_folder = self.folder + ".old"
+        shutil.rmtree(old_folder, ignore_errors=True)
+        if os.path.exists(self.folder):
+            os.replace(self.folder, old_folder)
+        os.makedirs(os.path.dirname(self.folder) or ".", exist_ok=True)
+        os.replace(self.tmp_folder, self.folder)
+        shutil.rmtree(old_folder, ignore_errors=True)
+
+
+# === SOURCES ===
+# A "source" is either a single CSV file or a store folder; the dashboard and analytics read both the same way.
+def read_table(source, usecols=None, dtype=np.float32, start=None, end=None):
+    if os.path.isdir(source):
+        return PartitionedStore(source).read_table(usecols, dtype, start, end)
+    return collapse_days(parse_trends_csv(source, usecols=usecols, dtype=dtype, start=start, end=end))
+
+
+def read_frame(source, date_column=None, usecols=None, dtype=np.float32, start=None, end=None):
+    return to_frame(read_table(source, usecols, dtype, start, end), date_column)
+
+
+def read_columns(source):
+    return PartitionedStore(source).columns if os.path.isdir(source) else read_trends_columns(source)
+
+
+def source_version(source):
+    if os.path.isdir(source):
+        return PartitionedStore(source).version()
+    stat = os.stat(source)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"